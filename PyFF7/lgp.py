@@ -4,13 +4,18 @@ Functions and classes for handling LGP archives
 Niema Moshiri 2019
 '''
 from . import MAX_UNSIGNED_INT,MAX_UNSIGNED_SHORT,NULL_BYTE,NULL_STR
+from array import array
+from mmap import mmap,ACCESS_READ
 from os.path import getsize
-from struct import pack,unpack
+from struct import iter_unpack,pack,unpack,unpack_from
+from sys import byteorder,platform
+import os
 
 # constants
 LOOKUP_VALUE_MAX = 30
 NUM_LOOKTAB_ENTRIES = LOOKUP_VALUE_MAX*LOOKUP_VALUE_MAX # Lookup Table has 900 entries
 MAX_CONFLICTS = 4096
+COPY_CHUNK_SIZE = 1024*1024 # chunk size for copying file data that can't be copied by the kernel
 
 # size of various items in an LGP archive (in bytes)
 SIZE = {
@@ -47,6 +52,9 @@ SIZE['LOOKTAB-ENTRY'] = sum(SIZE[k] for k in SIZE if k.startswith('LOOKTAB-ENTRY
 SIZE['LOOKTAB'] = NUM_LOOKTAB_ENTRIES*SIZE['LOOKTAB-ENTRY'] # 3600 bytes
 SIZE['DATA-ENTRY_HEADER'] = sum(SIZE[k] for k in SIZE if k.startswith('DATA-ENTRY_')) # 24 bytes
 
+# struct format of a single ToC entry: filename, data start position, check code, conflict table index
+TOC_ENTRY_FORMAT = '<%dsIBH' % SIZE['TOC-ENTRY_FILENAME']
+
 # start positions of various items in an LGP archive (in bytes)
 START = {
     # Header
@@ -74,6 +82,8 @@ ERROR_CHAR_INPUT = "Input must be a single character"
 ERROR_FILENAME_START_PERIOD = "Filename cannot begin with '.'"
 ERROR_INVALID_TOC_ENTRY = "Invalid Table of Contents entry"
 ERROR_LOOKUP_TOC_MISMATCH = "Lookup Table and Table of Contents do not match"
+ERROR_MMAP_WRITABLE = "Archive cannot be memory-mapped and writable at the same time"
+ERROR_NOT_WRITABLE = "Archive was not opened as writable"
 ERROR_NOT_STR = "Input is not a string"
 ERROR_TERMINATOR_SIZE = "Terminator is the wrong size"
 
@@ -141,11 +151,85 @@ def toc_to_lookup_table(toc):
     return [(toc_index[i], file_count[i]) for i in range(NUM_LOOKTAB_ENTRIES)]
 
 
+class LGPEntryData:
+    '''Data of an entry of an open ``LGP`` archive, used as a ``pack_lgp`` source so the data is copied from file to file without going through Python buffers'''
+    def __init__(self, lgp, entry):
+        self.lgp = lgp; self.entry = entry
+        if entry['filesize'] is None:
+            lgp.load_filesize(entry)
+
+def copy_range(infile, offset, size, outfile):
+    '''Copy ``size`` bytes starting at ``offset`` of ``infile`` to the current position of ``outfile``. The copy is done in the kernel with ``os.copy_file_range`` or ``os.sendfile`` where available, with a fallback to chunked reads and writes
+
+    Args:
+        ``infile`` (binary file): The file to copy from
+
+        ``offset`` (``int``): The position in ``infile`` to start copying from
+
+        ``size`` (``int``): The number of bytes to copy
+
+        ``outfile`` (binary file): The file to copy to
+    '''
+    outfile.flush(); pos = outfile.tell(); copied = 0
+    kernel_copy = getattr(os, 'copy_file_range', None)
+    if kernel_copy is None and hasattr(os, 'sendfile') and platform.startswith('linux'): # sendfile only accepts regular output files on Linux
+        kernel_copy = lambda in_fd, out_fd, count, offset_src: os.sendfile(out_fd, in_fd, offset_src, count)
+    if kernel_copy is not None:
+        try:
+            while copied < size:
+                n = kernel_copy(infile.fileno(), outfile.fileno(), size-copied, offset+copied)
+                if n == 0:
+                    break
+                copied += n
+        except OSError: # not supported between these files (e.g. across file systems on older kernels)
+            pass
+    outfile.seek(pos+copied, 0) # resynchronize the buffered file with what the kernel wrote
+    infile.seek(offset+copied, 0)
+    while copied < size:
+        chunk = infile.read(min(COPY_CHUNK_SIZE, size-copied))
+        if not chunk:
+            raise RuntimeError("Unexpected end of file while copying %d bytes at offset %d" % (size, offset))
+        outfile.write(chunk); copied += len(chunk)
+
+def source_size(source):
+    '''Return the size of the data of a file to pack
+
+    Args:
+        ``source`` (``str``, bytes-like, ``LGPEntryData`` or seekable binary stream): A full path on disk, an in-memory buffer, an entry of another archive, or a stream positioned at the start of the data
+
+    Returns:
+        ``int``: The number of bytes that will be packed from ``source``
+    '''
+    if isinstance(source,str):
+        return getsize(source)
+    elif isinstance(source,(bytes,bytearray,memoryview)):
+        return memoryview(source).nbytes
+    elif isinstance(source,LGPEntryData):
+        return source.entry['filesize']
+    pos = source.tell(); size = source.seek(0, 2) - pos; source.seek(pos, 0)
+    return size
+
+def write_source(outfile, source, size):
+    '''Write the ``size`` bytes of data from ``source`` (see ``source_size``) to ``outfile``'''
+    if isinstance(source,LGPEntryData):
+        copy_range(source.lgp.file, source.entry['data_start']+SIZE['DATA-ENTRY_HEADER'], size, outfile)
+        return
+    elif isinstance(source,str):
+        with open(source,'rb') as tmpfile:
+            data = tmpfile.read()
+    elif isinstance(source,(bytes,bytearray,memoryview)):
+        data = source
+    else:
+        data = source.read(size)
+    if memoryview(data).nbytes != size:
+        raise RuntimeError("Expected %d bytes of data, but got %d" % (size, memoryview(data).nbytes))
+    outfile.write(data)
+
 def pack_lgp(files, lgp_filename, creator=DEFAULT_CREATOR, terminator=DEFAULT_TERMINATOR):
     '''Pack the files in ``files`` into an LGP archive ``lgp_filename``. Note that we specify the number of files just in case ``files`` streams data for memory purposes.
 
     Args:
-        ``files`` (iterable of tuple of ``str``): The filenames to pack as (full path in archive, full path on disk) tuples
+        ``files`` (iterable of tuple): The files to pack as (full path in archive, source) tuples, where source is a full path on disk, an in-memory buffer (``bytes``, ``bytearray`` or ``memoryview``), an ``LGPEntryData`` or a seekable binary stream
 
         ``lgp_filename`` (``str``): The filename to write the packed LGP archive
     '''
@@ -155,7 +239,7 @@ def pack_lgp(files, lgp_filename, creator=DEFAULT_CREATOR, terminator=DEFAULT_TE
     # check filenames for validity and start building ToC
     toc = list(); file2path = dict()
     for i,e in enumerate(files):
-        archive_path, disk_path = e
+        archive_path, source = e
         f = archive_path.split('/')[-1]
         if len(f) > SIZE['TOC-ENTRY_FILENAME']:
             raise ValueError("File name longer than %d characters: %s" % (SIZE['TOC-ENTRY_FILENAME'],f))
@@ -165,7 +249,7 @@ def pack_lgp(files, lgp_filename, creator=DEFAULT_CREATOR, terminator=DEFAULT_TE
         if f not in file2path:
             file2path[f] = list()
         file2path[f].append((path,i)) # (location, ToC index) tuple
-        entry = {'filename':f, 'path':path, 'diskpath':disk_path, 'filesize': getsize(disk_path)}
+        entry = {'filename':f, 'path':path, 'archive_path':archive_path, 'source':source, 'filesize': source_size(source)}
         entry['check'] = 14 # It seems like most programs just give 14 (the most common value) and FF7 doesn't care. Hopefully somebody can figure out a correct way some day. I thought it might be User+Group file permissions (7+7=14)
         toc.append(entry)
     if len(toc) > MAX_UNSIGNED_INT:
@@ -222,26 +306,72 @@ def pack_lgp(files, lgp_filename, creator=DEFAULT_CREATOR, terminator=DEFAULT_TE
         # write file data
         for e in toc:
             if outfile.tell() != e['data_start']:
-                raise RuntimeError("File %s should be written at offset %d, but file is currently at offset %d" % (e['diskpath'],e['data_start'],outfile.tell()))
+                raise RuntimeError("File %s should be written at offset %d, but file is currently at offset %d" % (e['archive_path'],e['data_start'],outfile.tell()))
             outfile.write(e['filename'].encode()); outfile.write((SIZE['DATA-ENTRY_FILENAME']-len(e['filename']))*NULL_BYTE) # filename (20 bytes)
             outfile.write(pack('I', e['filesize'])) # filesize (4 bytes)
-            with open(e['diskpath'],'rb') as tmpfile:
-                outfile.write(tmpfile.read())
+            write_source(outfile, e['source'], e['filesize'])
 
         # write file terminator
         outfile.write(terminator.encode())
 
+def repack_lgp(lgp, replacements, lgp_filename):
+    '''Pack a copy of the open archive ``lgp`` into ``lgp_filename``, replacing some of its files. Unchanged files are copied straight from ``lgp`` by the kernel where possible (see ``copy_range``), so only the replaced files go through Python buffers
+
+    Args:
+        ``lgp`` (``LGP``): The archive to copy
+
+        ``replacements`` (``dict``): The new data (any ``pack_lgp`` source) of the files to replace, keyed by file name as accepted by ``LGP.get``
+
+        ``lgp_filename`` (``str``): The filename to write the packed LGP archive (must not be the file of ``lgp``)
+    '''
+    replaced = dict()
+    for name, source in replacements.items():
+        entry = lgp.get(name)
+        if entry is None:
+            raise KeyError("File not found in archive: %s" % name)
+        replaced[id(entry)] = source
+    files = [(entry['filename'], replaced[id(entry)] if id(entry) in replaced else LGPEntryData(lgp, entry)) for entry in lgp]
+    pack_lgp(files, lgp_filename, lgp.header['file_creator'], lgp.terminator)
+
+class TocEntry:
+    '''Compact Table of Contents entry. Fields can also be accessed dict-style (``entry['filename']``), like the other entries of this module'''
+    __slots__ = ('filename', 'data_start', 'check', 'conflict_index', 'filesize')
+
+    def __init__(self, filename, data_start, check, conflict_index, filesize=None):
+        self.filename = filename; self.data_start = data_start; self.check = check; self.conflict_index = conflict_index; self.filesize = filesize
+
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return key in TocEntry.__slots__
+
+    def __repr__(self):
+        return repr({key: getattr(self, key) for key in TocEntry.__slots__})
+
 class LGP:
     '''LGP Archive class'''
-    def __init__(self, filename, check=False):
+    def __init__(self, filename, check=False, use_mmap=False, writable=False):
         '''``LGP`` constructor
 
         Args:
             ``filename`` (``str``): The filename of the LGP archive
 
             ``check`` (``bool``): ``True`` to check the Lookup Table vs. Table of Contents for validity, otherwise ``False``
+
+            ``use_mmap`` (``bool``): ``True`` to memory-map the archive and return file data as zero-copy ``memoryview`` slices of the mapping, otherwise ``False``
+
+            ``writable`` (``bool``): ``True`` to open the archive for in-place updates with ``update_entry``, otherwise ``False``
         '''
-        self.filename = filename; self.file = open(filename, 'rb'); total_filesize = getsize(self.filename)
+        if use_mmap and writable:
+            raise ValueError(ERROR_MMAP_WRITABLE)
+        self.filename = filename; self.writable = writable; self.file = open(filename, 'r+b' if writable else 'rb'); total_filesize = getsize(self.filename)
+        self.mmap = None; self.view = None
+        if use_mmap:
+            self.mmap = mmap(self.file.fileno(), 0, access=ACCESS_READ); self.view = memoryview(self.mmap)
 
         # read header
         tmp = self.file.read(SIZE['HEADER'])
@@ -250,26 +380,17 @@ class LGP:
             'num_files': unpack('I', tmp[START['HEADER_NUM-FILES']:START['HEADER_NUM-FILES']+SIZE['HEADER_NUM-FILES']])[0],
         }
 
-        # read table of contents
-        self.toc = list(); self.conflicting_filenames = set()
-        for i in range(self.header['num_files']):
-            tmp = self.file.read(SIZE['TOC-ENTRY'])
-            tmp_filename = tmp[START['TOC-ENTRY_FILENAME']:START['TOC-ENTRY_FILENAME']+SIZE['TOC-ENTRY_FILENAME']].decode().strip(NULL_STR)
-            tmp_data_start = unpack('I', tmp[START['TOC-ENTRY_DATA-START']:START['TOC-ENTRY_DATA-START']+SIZE['TOC-ENTRY_DATA-START']])[0]
-            tmp_check = ord(tmp[START['TOC-ENTRY_CHECK']:START['TOC-ENTRY_CHECK']+SIZE['TOC-ENTRY_CHECK']])
-            tmp_conflict_index = unpack('H', tmp[START['TOC-ENTRY_CONFLICT-INDEX']:START['TOC-ENTRY_CONFLICT-INDEX']+SIZE['TOC-ENTRY_CONFLICT-INDEX']])[0]
-            self.toc.append({'filename':tmp_filename, 'data_start':tmp_data_start, 'check':tmp_check, 'conflict_index':tmp_conflict_index})
-            if tmp_conflict_index != 0:
-                self.conflicting_filenames.add(tmp_filename)
-
-        # read lookup table (3600 bytes)
-        tmp = self.file.read(SIZE['LOOKTAB'])
-        self.lookup_table = list()
-        for i in range(NUM_LOOKTAB_ENTRIES):
-            start = i*SIZE['LOOKTAB-ENTRY']
-            tmp_toc_index = unpack('H', tmp[start : start + SIZE['LOOKTAB-ENTRY_INDEX']])[0]
-            tmp_file_count = unpack('H', tmp[start + SIZE['LOOKTAB-ENTRY_INDEX'] : start + SIZE['LOOKTAB-ENTRY']])[0]
-            self.lookup_table.append((tmp_toc_index,tmp_file_count))
+        # read table of contents in one go and decode it in bulk (file sizes are read lazily, see load_filesizes)
+        tmp = self.file.read(self.header['num_files']*SIZE['TOC-ENTRY'])
+        self.toc = [TocEntry(name.decode().strip(NULL_STR), data_start, check, conflict_index) for name, data_start, check, conflict_index in iter_unpack(TOC_ENTRY_FORMAT, tmp)]
+        self.conflicting_filenames = {entry.filename for entry in self.toc if entry.conflict_index != 0}
+        self.filesizes_loaded = False; self.names = dict()
+
+        # read lookup table (3600 bytes) as 1800 little-endian shorts: (toc_index, file_count) pairs
+        tmp = array('H', self.file.read(SIZE['LOOKTAB']))
+        if byteorder == 'big':
+            tmp.byteswap()
+        self.lookup_table = list(zip(tmp[0::2], tmp[1::2]))
 
         # read conflict table (2 bytes for number of conflicts, and for files with num_conflicts != 0, the actual table)
         self.num_conflicting_filenames = unpack('H', self.file.read(SIZE['CONTAB_NUM-CONFLICTS']))[0] # the first 2 bytes of the conflict table are the number of conflicts
@@ -278,16 +399,14 @@ class LGP:
             for j in range(curr_num_conflicts):
                 curr_folder_name = self.file.read(SIZE['CONTAB-ENTRY_FOLDER-NAME']).decode().strip(NULL_STR)
                 curr_toc_index = unpack('H', self.file.read(SIZE['CONTAB-ENTRY_TOC-INDEX']))[0] #- 1 # it's 1-based, so subtract 1 to get indexing into self.toc
-                self.toc[curr_toc_index]['filename'] = "%s/%s" % (curr_folder_name, self.toc[curr_toc_index]['filename']) # update filename in Table of Contents
+                self.toc[curr_toc_index].filename = "%s/%s" % (curr_folder_name, self.toc[curr_toc_index].filename) # update filename in Table of Contents
 
-        # read file sizes
-        for entry in self.toc:
-            self.file.seek(entry['data_start']+SIZE['DATA-ENTRY_FILENAME'], 0); entry['filesize'] = unpack('I', self.file.read(SIZE['DATA-ENTRY_FILESIZE']))[0]
-
-        # read any remaining files that weren't in Table of Contents (e.g. in battle.lgp)
+        # read any remaining files that weren't in Table of Contents (e.g. in battle.lgp), starting after the last file in data order
         self.non_toc_files = list()
-        self.file.seek(self.toc[-1]['data_start']+SIZE['DATA-ENTRY_FILENAME'], 0) # move to filesize of last file
-        self.file.seek(unpack('I', self.file.read(SIZE['DATA-ENTRY_FILESIZE']))[0], 1) # move forward to end of last file's data
+        if len(self.toc) != 0:
+            last = max(self.toc, key=lambda entry: entry.data_start)
+            self.file.seek(last.data_start+SIZE['DATA-ENTRY_FILENAME'], 0) # move to filesize of last file
+            self.file.seek(unpack('I', self.file.read(SIZE['DATA-ENTRY_FILESIZE']))[0], 1) # move forward to end of last file's data
         stopping_point = total_filesize - SIZE['TERMINATOR']
         while self.file.tell() < stopping_point:
             entry = dict()
@@ -300,7 +419,8 @@ class LGP:
         # read terminator
         if total_filesize - self.file.tell() != SIZE['TERMINATOR']:
             raise ValueError(ERROR_TERMINATOR_SIZE)
-        self.terminator = self.file.read().decode().strip(NULL_STR)
+        self.terminator_start = self.file.tell(); self.terminator_raw = self.file.read()
+        self.terminator = self.terminator_raw.decode().strip(NULL_STR)
 
         # check lookup table for validity
         if check and not self.valid_lookup():
@@ -308,6 +428,18 @@ class LGP:
 
     def __del__(self):
         '''``LGP`` destructor'''
+        self.close()
+
+    def close(self):
+        '''Close the archive. In mmap mode, the mapping stays alive until all ``memoryview`` slices returned by this archive are released'''
+        if getattr(self, 'view', None) is not None:
+            self.view.release(); self.view = None
+        if getattr(self, 'mmap', None) is not None:
+            try:
+                self.mmap.close()
+            except BufferError: # slices are still referenced by the caller; the mapping is freed with them
+                pass
+            self.mmap = None
         if hasattr(self, 'file'):
             self.file.close()
 
@@ -321,9 +453,65 @@ class LGP:
 
     def __iter__(self):
         '''Iterate over the file entires in this LGP'''
+        self.load_filesizes()
         for entry in self.toc+self.non_toc_files:
             yield entry
 
+    def load_filesize(self, entry):
+        '''Read the file size of a single Table of Contents ``entry`` from its data entry header'''
+        start = entry.data_start+SIZE['DATA-ENTRY_FILENAME']
+        if self.view is not None:
+            entry.filesize = unpack_from('I', self.view, start)[0]
+        else:
+            self.file.seek(start, 0); entry.filesize = unpack('I', self.file.read(SIZE['DATA-ENTRY_FILESIZE']))[0]
+
+    def load_filesizes(self):
+        '''Read the file size of every Table of Contents entry from its data entry header. This is done once, on first use, visiting entries in data order so the archive is read front to back'''
+        if self.filesizes_loaded:
+            return
+        for entry in sorted(self.toc, key=lambda entry: entry.data_start):
+            if entry.filesize is None:
+                self.load_filesize(entry)
+        self.filesizes_loaded = True
+
+    def get(self, name):
+        '''Find the entry for file ``name`` using the Lookup Table, so only the files sharing its first two characters are compared
+
+        Args:
+            ``name`` (``str``): The file name, optionally prefixed with its folder for files in the Conflict Table
+
+        Returns:
+            ``TocEntry`` or ``dict``: The entry for the file, or ``None`` if it's not in the archive
+        '''
+        if name in self.names:
+            return self.names[name]
+        key = name.lstrip('/'); entry = None
+        try:
+            toc_index, count = self.lookup_table[filename_to_lookup_index(key)]
+        except (ValueError, IndexError):
+            toc_index, count = 0, 0
+        for candidate in self.toc[toc_index-1:toc_index-1+count] if toc_index != 0 else []:
+            if candidate.filename.lstrip('/') == key:
+                entry = candidate; break
+        if entry is None: # not where the Lookup Table points to (unsorted archive or a non-ToC file)
+            entry = next((e for e in self.toc+self.non_toc_files if e['filename'].lstrip('/') == key), None)
+        self.names[name] = entry
+        return entry
+
+    def open_entry(self, name):
+        '''Load the data of file ``name``, without reading any other file in the archive
+
+        Args:
+            ``name`` (``str``): The file name, optionally prefixed with its folder for files in the Conflict Table
+
+        Returns:
+            ``bytes``: The data of the file (a ``memoryview`` of the mapping in mmap mode)
+        '''
+        entry = self.get(name)
+        if entry is None:
+            raise KeyError("File not found in archive: %s" % name)
+        return self.load_toc_entry(entry)
+
     def load_bytes(self, start, size):
         '''Load the first ``size`` bytes starting with position ``start``
 
@@ -333,8 +521,10 @@ class LGP:
             ``size`` (``int``): The number of bytes to read
 
         Returns:
-            ``bytes``: The first ``size`` bytes starting with position ``start``
+            ``bytes``: The first ``size`` bytes starting with position ``start`` (a ``memoryview`` of the mapping in mmap mode)
         '''
+        if self.view is not None:
+            return self.view[start:start+size]
         self.file.seek(start, 0)
         return self.file.read(size)
 
@@ -345,17 +535,58 @@ class LGP:
             ``entry`` (``dict``): The Table of Contents entry to load
 
         Returns:
-            ``bytes``: The data corresponding to the given Table of Contents entry
+            ``bytes``: The data corresponding to the given Table of Contents entry (a ``memoryview`` of the mapping in mmap mode)
         '''
         if 'data_start' not in entry or 'filesize' not in entry:
             raise TypeError(ERROR_INVALID_TOC_ENTRY)
+        if entry['filesize'] is None:
+            self.load_filesize(entry)
         return self.load_bytes(entry['data_start']+SIZE['DATA-ENTRY_HEADER'], entry['filesize'])
 
     def load_files(self):
         '''Load each file contained in the LGP archive, yielding (filename, data) tuples'''
+        self.load_filesizes()
         for entry in self.toc+self.non_toc_files:
             yield (entry['filename'], self.load_toc_entry(entry))
 
+    def update_entry(self, name, data):
+        '''Replace the data of file ``name`` without rewriting the archive. The data is overwritten in place when it fits the space the entry occupies (or when the entry is the last one in the archive); otherwise it's appended at the end of the archive, the terminator is moved after it and the entry's data start position in the Table of Contents is updated.
+
+        Args:
+            ``name`` (``str``): The file name, optionally prefixed with its folder for files in the Conflict Table
+
+            ``data`` (``bytes``): The new data of the file
+        '''
+        if not self.writable:
+            raise ValueError(ERROR_NOT_WRITABLE)
+        entry = self.get(name)
+        if entry is None:
+            raise KeyError("File not found in archive: %s" % name)
+        if not isinstance(entry, TocEntry):
+            raise ValueError("Only files in the Table of Contents can be updated: %s" % name)
+
+        # space available for the data: up to the next data entry or the terminator
+        next_start = min([e['data_start'] for e in self.toc+self.non_toc_files if e['data_start'] > entry.data_start] + [self.terminator_start])
+        header = entry.filename.split('/')[-1].encode(); header += (SIZE['DATA-ENTRY_FILENAME']-len(header))*NULL_BYTE + pack('I', len(data))
+        if next_start == self.terminator_start: # last entry: it can grow or shrink freely
+            start = entry.data_start; move_terminator = True
+        elif SIZE['DATA-ENTRY_HEADER'] + len(data) <= next_start - entry.data_start:
+            start = entry.data_start; move_terminator = False
+        else:
+            if len(self.non_toc_files) != 0:
+                raise ValueError("Cannot move %s to the end of an archive containing files outside the Table of Contents" % name)
+            start = self.terminator_start; move_terminator = True
+
+        self.file.seek(start, 0); self.file.write(header); self.file.write(data)
+        if move_terminator:
+            self.terminator_start = self.file.tell(); self.file.write(self.terminator_raw); self.file.truncate()
+        if start != entry.data_start:
+            toc_index = next(i for i, e in enumerate(self.toc) if e is entry)
+            self.file.seek(START['TOC'] + toc_index*SIZE['TOC-ENTRY'] + START['TOC-ENTRY_DATA-START'], 0); self.file.write(pack('I', start))
+            entry.data_start = start
+        entry.filesize = len(data)
+        self.file.flush()
+
     def valid_lookup(self):
         '''Check if this LGP file's Lookup Table is valid with respect to its Table of Contents
 
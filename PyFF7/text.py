@@ -182,6 +182,86 @@ CHAR = {
 KANJI_BANK = {0xFA:'KANJI_SET1', 0xFB:'KANJI_SET2', 0xFC:'KANJI_SET3', 0xFD:'KANJI_SET4', 0xFE:'KANJI_SET5'}
 fieldCommands = {**{v:(pack('B', k)) for k, v in CHAR['FIELD_SPECIAL'].items() if v}, **{v:(pack('B', 0xFE) + pack('B', k)) for k, v in CHAR['FIELD_CONTROL'].items() if v}}
 
+# Characters of the field module that are encoded as single bytes outside the regular character set
+FIELD_CHARS = {u'\t':0xE1, u'\n':0xE7, u'〇':0xF6, u'△':0xF7, u'☐':0xF8, u'✕':0xF9}
+
+class EncodeMap(dict):
+    '''``str.translate`` table that raises ``ValueError`` for unencodable characters instead of leaving them unchanged'''
+    def __missing__(self, key):
+        raise ValueError(chr(key))
+
+def build_decode_table(JP):
+    '''Build the 256-entry table mapping each byte of Field text to its decoded text, or ``None`` for bytes that need special handling (end of string, control codes, Kanji) or are illegal
+
+    Args:
+        ``JP`` (``bool``): ``True`` to build the table for Japanese text, otherwise ``False``
+
+    Returns:
+        ``list`` of ``str``: The decode table
+    '''
+    char_set = {True:CHAR['NORMAL_JP'], False:CHAR['NORMAL']}[JP]
+    num_normal_chars = {True:0xE7, False:0xE0}[JP]
+    table = [None]*256
+    for c in range(256):
+        if c < num_normal_chars:
+            t = char_set[c]
+            table[c] = u"\\" + t if t in CHAR['ESCAPE'] else t
+        elif c in (0xFE, 0xFF) or (JP and 0xFA <= c <= 0xFD):
+            continue
+        elif CHAR['FIELD_SPECIAL'].get(c):
+            table[c] = CHAR['FIELD_SPECIAL'][c] + (u'\n' if c == 0xE8 else u'') # newline after {NEW}
+    return table
+
+def build_encode_table(field, JP):
+    '''Build the ``str.translate`` table mapping each encodable character to the character whose code point is its FF7 code
+
+    Args:
+        ``field`` (``bool``): ``True`` to build the table for Field text, otherwise ``False``
+
+        ``JP`` (``bool``): ``True`` to build the table for Japanese text, otherwise ``False``
+
+    Returns:
+        ``EncodeMap``: The encode table
+    '''
+    table = EncodeMap()
+    for code, c in enumerate({True:CHAR['NORMAL_JP'], False:CHAR['NORMAL']}[JP]):
+        table.setdefault(ord(c), chr(code)) # the first occurrence wins, like str.index
+    if field:
+        table.update({ord(c):chr(code) for c, code in FIELD_CHARS.items()})
+    return table
+
+# tables are built on first use, so importing the module stays cheap
+DECODE_TABLE = dict()
+ENCODE_TABLE = dict()
+
+def get_decode_table(JP):
+    '''Return the decode table for the given language, building it on first use
+
+    Args:
+        ``JP`` (``bool``): ``True`` for Japanese text, otherwise ``False``
+
+    Returns:
+        ``list`` of ``str``: The decode table
+    '''
+    if JP not in DECODE_TABLE:
+        DECODE_TABLE[JP] = build_decode_table(JP)
+    return DECODE_TABLE[JP]
+
+def get_encode_table(field, JP):
+    '''Return the encode table for the given kind of text, building it on first use
+
+    Args:
+        ``field`` (``bool``): ``True`` for Field text, otherwise ``False``
+
+        ``JP`` (``bool``): ``True`` for Japanese text, otherwise ``False``
+
+    Returns:
+        ``EncodeMap``: The encode table
+    '''
+    if (field, JP) not in ENCODE_TABLE:
+        ENCODE_TABLE[(field, JP)] = build_encode_table(field, JP)
+    return ENCODE_TABLE[(field, JP)]
+
 # errors
 
 def decode_kanji(bank, code):
@@ -203,36 +283,41 @@ def decode_field_text(data, JP=False):
     '''Decode Field text to unicode
 
     Args:
-        ``data`` (``bytes``): Raw Field text to decode
+        ``data`` (``bytes``, ``bytearray`` or ``memoryview``): Raw Field text to decode
 
         ``JP`` (``bool``): ``True`` if the text to decode is Japanese, otherwise ``False``
 
     Returns:
         ``str``: Decoded unicode text
     '''
-    if not isinstance(data,bytes) and not isinstance(data,bytearray):
+    if not isinstance(data,(bytes,bytearray,memoryview)):
         raise TypeError("Expected bytes, but received %s" % str(type(data)))
-    char_set = {True:CHAR['NORMAL_JP'], False:CHAR['NORMAL']}[JP]
-    num_normal_chars = {True:0xE7, False:0xE0}[JP]
-    text = u''; i = 0
+    if isinstance(data,memoryview):
+        data = data.tobytes()
+    table = get_decode_table(JP)
+
+    # fast path: no control codes or Kanji (whose arguments could contain 0xFF) before the first 0xFF
+    end = data.find(0xFF)
+    parts = [table[c] for c in data[:len(data) if end == -1 else end]]
+    if None not in parts:
+        return u''.join(parts)
+
+    text = []; i = 0
     while i < len(data):
         c = data[i]; i += 1
         # end of string
         if c == 0xFF:
             break
 
-        # regular printable character
-        elif c < num_normal_chars:
-            t = char_set[c]
-            if t in CHAR['ESCAPE']:
-                text += u"\\"
-            text += t
+        # regular printable character or Field module special character
+        elif table[c] is not None:
+            text.append(table[c])
 
         # Kanji
         elif 0xFA <= c <= 0xFD and JP:
             if i >= len(data):
                 raise IndexError("Spurious kanji code %02x at end of string %r" % (c, data))
-            k = data[i]; i += 1; text += decode_kanji(c,k)
+            k = data[i]; i += 1; text.append(decode_kanji(c,k))
 
         # Field module control code or Kanji
         elif c == 0xFE:
@@ -242,37 +327,30 @@ def decode_field_text(data, JP=False):
 
             # regular Kanji
             if k < 0xD2 and JP:
-                text += decode_kanji(c, k)
+                text.append(decode_kanji(c, k))
 
             # WAIT <arg> command
             elif k == 0xDD:
                 if i >= len(data) - 1:
                     raise IndexError("Spurious WAIT command at end of string %r" % data)
-                arg = unpack('H', data[i:i+2])[0]; i += 2; text += u"{WAIT %d}" % arg
+                arg = unpack('H', data[i:i+2])[0]; i += 2; text.append(u"{WAIT %d}" % arg)
 
             # STR <offset> <length> command
             elif k == 0xE2:
                 if i >= len(data) - 3:
                     raise IndexError("Spurious STR command at end of string %r" % data)
-                offset = unpack('H', data[i:i+2])[0]; length = unpack('H', data[i+2:i+4])[0]; i += 4; text += u"{STR %04x %04x}" % (offset, length)
+                offset = unpack('H', data[i:i+2])[0]; length = unpack('H', data[i+2:i+4])[0]; i += 4; text.append(u"{STR %04x %04x}" % (offset, length))
 
             # Other control code
             else:
                 if k not in CHAR['FIELD_CONTROL']:
                     raise IndexError("Illegal control code %02x in field string %r" % (k, data))
-                text += CHAR['FIELD_CONTROL'][k]
+                text.append(CHAR['FIELD_CONTROL'][k])
 
-        # Field module special character
+        # Illegal character
         else:
-            t = CHAR['FIELD_SPECIAL'][c]
-            if not t:
-                raise IndexError("Illegal character %02x in field string %r" % (c, data))
-
-            # newline after {NEW}
-            if c == 0xE8:
-                t += '\n'
-            text += t
-    return text
+            raise IndexError("Illegal character %02x in field string %r" % (c, data))
+    return u''.join(text)
 
 def encode_text(text, field=True, JP=False):
     '''Encode unicode string to FF7 text
@@ -289,7 +367,15 @@ def encode_text(text, field=True, JP=False):
     '''
     if not isinstance(text,str):
         raise TypeError("Expected string, but received %s" % str(type(text)))
-    char_set = {True:CHAR['NORMAL_JP'], False:CHAR['NORMAL']}[JP]
+    encode_table = get_encode_table(field, JP)
+
+    # fast path: no escape or command sequences, so every character maps to a single byte
+    if u'\\' not in text and u'{' not in text:
+        try:
+            return text.translate(encode_table).encode('latin-1') + b'\xFF'
+        except ValueError as e:
+            raise ValueError("Unencodable character '%s' in string '%s'" % (e.args[0], text))
+
     text_length = len(text)
     data = bytearray(); i = 0
     while i < text_length:
@@ -300,8 +386,8 @@ def encode_text(text, field=True, JP=False):
             if i >= text_length:
                 raise IndexError("Spurious '\\' at end of string '%s'" % text)
             c = text[i]; i += 1
-            if c in escapeChars:
-                data += pack('B', char_set.index(c))
+            if c in CHAR['ESCAPE']:
+                data.append(ord(encode_table[ord(c)]))
             else:
                 raise ValueError("Unknown escape sequence '\\%s' in string '%s'" % (c, text))
 
@@ -322,7 +408,7 @@ def encode_text(text, field=True, JP=False):
                     arg = int(m.group(1))
                     if arg > 0xFFFF:
                         raise ValueError("Argument of WAIT command greater than 65535 in string '%s'" % text)
-                    data += '\xFE\xDD'; data += pack("<H", arg)
+                    data += b'\xFE\xDD'; data += pack("<H", arg)
 
                 # STR <offset> <length>
                 elif keyword == u'STR':
@@ -330,7 +416,7 @@ def encode_text(text, field=True, JP=False):
                     if not m:
                         raise ValueError("Syntax error in command '%s' in string '%s'" % (command, text))
                     offset = int(m.group(1), 16); length = int(m.group(2), 16)
-                    data += '\xFE\xE2'; data += pack("<HH", offset, length)
+                    data += b'\xFE\xE2'; data += pack("<HH", offset, length)
 
                 # simple command without argumentss
                 else:
@@ -350,7 +436,7 @@ def encode_text(text, field=True, JP=False):
                     m = match(r"COLOR ([a-fA-F0-9]{2})", command)
                     if not m:
                         raise ValueError("Syntax error in command '%s' in string '%s'" % (command, text))
-                    data += '\xF8'; data += pack('B', int(m.group(1), 16))
+                    data += b'\xF8'; data.append(int(m.group(1), 16))
 
                 # kernel variable reference
                 else:
@@ -365,33 +451,12 @@ def encode_text(text, field=True, JP=False):
                     if not found:
                         raise ValueError("Unknown command '%s' in string '%s'" % (command, text))
 
-        # special field characters
+        # special field characters and regular printable characters
         else:
-            if field:
-                if c == u'\t':
-                    data += pack('B', 0xE1)
-                    continue
-                elif c == u'\n':
-                    data += pack('B', 0xE7)
-                    continue
-                elif c == u'〇':
-                    data += pack('B', 0xF6)
-                    continue
-                elif c == u'△':
-                    data += pack('B', 0xF7)
-                    continue
-                elif c == u'☐':
-                    data += pack('B', 0xF8)
-                    continue
-                elif c == u'✕':
-                    data += pack('B', 0xF9)
-                    continue
-
-            # regular printable character
             try:
-                data += pack('B', char_set.index(c))
+                data.append(ord(encode_table[ord(c)]))
             except ValueError:
                 raise ValueError("Unencodable character '%s' in string '%s'" % (c, text))
 
     # terminate string
-    return data + b'\xFF'
+    return bytes(data) + b'\xFF'
@@ -0,0 +1,86 @@
+'''
+Static cost analysis of world script functions
+'''
+
+from constants import OPCODES
+from extrator import Extractor
+
+COLUMNS = ['instructions', 'best', 'worst', 'loops', 'wait']
+DELAY_OPCODES = [OPCODES[0x305][0], OPCODES[0x306][0]]  # Frames, Wait
+
+
+def count_opcodes(code, start, end):
+    """Returns the number of opcodes the VM executes for the words in ``code[start:end]``"""
+    count = 0
+    pos = start
+    while pos < end:
+        word = code[pos]
+        pos += 1 + (OPCODES[word][2] if word in OPCODES else 0)
+        count += 1
+    return count
+
+
+def analyze_function(instructions, blocks, code):
+    """Returns the static costs of a decoded function as a dict:
+
+    * ``instructions`` - number of opcodes in the function
+    * ``best``/``worst`` - opcodes executed on the shortest and longest path from the start to the end of the
+      function, following If and GoTo jumps but not going around loops
+    * ``loops`` - number of backward GoTo jumps
+    * ``wait`` - total of the constant durations passed to Wait and Frames
+    """
+    weights = []
+    for block in blocks:
+        weights.append(sum(count_opcodes(code, ins.start, ins.end) for ins in instructions[block.first:block.last]
+                           if ins.start is not None))
+
+    # Blocks are in code order, so the forward edges form a DAG that can be walked from the end
+    best = [0] * len(blocks)
+    worst = [0] * len(blocks)
+    for n in range(len(blocks) - 1, -1, -1):
+        forward = [s for s in blocks[n].successors if s > n]
+        best[n] = weights[n] + (min(best[s] for s in forward) if forward else 0)
+        worst[n] = weights[n] + (max(worst[s] for s in forward) if forward else 0)
+
+    loops = 0
+    wait = 0
+    for ins in instructions:
+        if ins.name == OPCODES[0x200][0] and ins.target is not None and ins.target <= ins.pos:
+            loops += 1
+        elif ins.name in DELAY_OPCODES and ins.params and ins.params[0].isdecimal():
+            wait += int(ins.params[0])
+
+    return {
+        'instructions': sum(weights),
+        'best': best[0] if blocks else 0,
+        'worst': worst[0] if blocks else 0,
+        'loops': loops,
+        'wait': wait,
+    }
+
+
+def analyze_script(filename, script):
+    """Returns the costs of every function in an ev image. Duplicate functions are skipped."""
+    extractor = Extractor(None, None, False)
+    code = extractor.read_code(script)
+    results = []
+    for function in extractor.read_functions(extractor.read_index(script), code):
+        name, opcodes, blocks = function[0], function[1], function[-1]
+        if opcodes is None:
+            continue
+
+        results.append({'script': filename, 'function': name, **analyze_function(opcodes, blocks, code)})
+
+    return results
+
+
+def format_table(results):
+    lines = ['%-8s %-24s %12s %6s %6s %6s %6s' % ('script', 'function', *COLUMNS)]
+    for r in results:
+        lines.append('%-8s %-24s %12d %6d %6d %6d %6d' % (r['script'], r['function'], *[r[c] for c in COLUMNS]))
+    return '\n'.join(lines)
+
+
+def format_json(results):
+    from json import dumps
+    return dumps(results, indent=2)
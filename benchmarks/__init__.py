@@ -0,0 +1,3 @@
+'''
+Performance benchmarks for Terraform. Run a benchmark module with ``python -m benchmarks.<name>``
+'''
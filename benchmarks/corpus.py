@@ -0,0 +1,136 @@
+'''
+Synthetic data for the benchmarks: world script sources, compiled world archives and LGP archives of any size
+'''
+from contextlib import redirect_stdout
+from io import StringIO
+from os import makedirs
+from os.path import join
+from random import Random
+
+from constants import OPCODES, SPECIAL_VARS
+from PyFF7.lgp import pack_lgp
+
+# Statement opcodes to generate, with their number of stack arguments. Flow control and opcodes that take extra
+# code arguments are generated separately, and SetWindowMessage needs a valid message ID so it's left out.
+STATEMENTS = [(name, args) for code, (name, args, params, statement) in OPCODES.items()
+              if statement and params == 0 and code not in (0x201, 0x204) and name != 'SetWindowMessage']
+OPERATORS = ['+', '-', '*', '>>', '<<', '<', '>', '<=', '>=', '==', 'AND', 'OR']
+COMPARISONS = ['<', '>', '<=', '>=', '==']
+# The decompiler expects $PlayerEntityModelId and $LastFieldID on the left side of comparisons, like the game does
+VARIABLES = ['SpecialByte($%s)' % name for key, name in SPECIAL_VARS.items() if key not in ('6', '8')] + \
+            ['TempByte(%d)', 'SavemapByte(0x0C15)', 'SavemapWord(0x0C16)', 'SavemapBit(0x0F29, 3)']
+
+
+def make_expression(random, depth=0):
+    choice = random.random()
+    if depth < 2 and choice < 0.3:
+        return '%s %s %s' % (make_expression(random, depth + 1), random.choice(OPERATORS),
+                             make_expression(random, depth + 1))
+    if choice < 0.7:
+        return str(random.randint(0, 0x7FFF))
+
+    variable = random.choice(VARIABLES)
+    return variable % random.randint(0, 15) if '%d' in variable else variable
+
+
+def make_statement(random):
+    name, args = random.choice(STATEMENTS)
+    return '%s(%s)' % (name, ', '.join(make_expression(random) for _ in range(args)))
+
+
+def make_source(random, statements=12):
+    """Returns the source of a function with ``statements`` random statements, If blocks and loops.
+
+    Only code that survives a decompile/compile round-trip is generated: If conditions are comparisons (a plain
+    value would be taken as the If parameter), If blocks are never empty and labels never start the function.
+    """
+    lines = []
+    blocks = []  # number of statements in each open If block
+    labels = 0
+    for _ in range(statements):
+        choice = random.random()
+        if choice < 0.15 and len(blocks) < 3:
+            lines.append('  ' * len(blocks) + 'If %s %s %s Then' % (make_expression(random),
+                                                                    random.choice(COMPARISONS),
+                                                                    make_expression(random)))
+            blocks.append(0)
+        elif choice < 0.25 and blocks and blocks[-1] > 0:
+            blocks.pop()
+            lines.append('  ' * len(blocks) + 'EndIf')
+        elif choice < 0.3 and not blocks and lines and lines[-1][0] != '@':
+            labels += 1
+            lines.append('@LABEL_%d' % labels)
+        else:
+            lines.append('  ' * len(blocks) + make_statement(random))
+            if blocks:
+                blocks[-1] += 1
+
+    while blocks:
+        if blocks.pop() == 0:
+            lines.append('  ' * (len(blocks) + 1) + make_statement(random))
+        lines.append('  ' * len(blocks) + 'EndIf')
+    if labels > 0:
+        lines.append('GoTo @LABEL_%d' % random.randint(1, labels))
+    lines.append('End')
+    return '\n'.join(lines) + '\n'
+
+
+def make_messages(random, count=100):
+    words = ['Cloud', 'Highwind', 'chocobo', 'the', 'world', 'map', 'ride', 'Yes', 'No', 'Gil', 'submarine', '...']
+    return [' '.join(random.choice(words) for _ in range(random.randint(2, 6))) for _ in range(count)]
+
+
+def make_corpus(directory, functions=60, statements=12, seed=0):
+    """Writes an input directory in the format produced by ``terraform.py extract``, with ``functions`` functions
+    in each wmX.ev directory (a few of them duplicates) and a messages.txt"""
+    random = Random(seed)
+    makedirs(directory, exist_ok=True)
+    with open(join(directory, 'messages.txt'), 'w') as file:
+        for i, message in enumerate(make_messages(random)):
+            file.write("---[ MESSAGE ID %d:\n%s\n\n" % (i, message))
+
+    for script in ['wm0.ev', 'wm2.ev', 'wm3.ev']:
+        path = join(directory, script)
+        makedirs(path, exist_ok=True)
+        for n in range(functions):
+            kind = n * 3 // functions
+            if kind == 0:
+                name = 'system_%02d' % n
+            elif kind == 1:
+                name = 'model_%02d_%02d' % (n % 32, n)
+            else:
+                name = 'mesh_%02d_%02d_%d' % (n % 28, n % 36, n % 4)
+
+            if n > 0 and n % 16 == 0:
+                with open(join(path, '%03d-%03d_%s.s' % (n, n - 1, name)), 'w') as file:
+                    file.write('# Dummy function, duplicate of function #%03d' % (n - 1))
+                continue
+
+            with open(join(path, '%03d_%s.s' % (n, name)), 'w') as file:
+                file.write(make_source(random, statements))
+
+
+def make_world(directory, lgp_filename, functions=60, statements=12, seed=0):
+    """Generates a corpus in ``directory`` and compiles it into a world LGP archive with the mes and wmX.ev files"""
+    from parse import Parser
+
+    make_corpus(directory, functions, statements, seed)
+    output = StringIO()
+    try:
+        with redirect_stdout(output):
+            parser = Parser(directory)
+            parser.compile()
+            files = parser.build_files()
+    except SystemExit:
+        print(output.getvalue())
+        raise
+
+    pack_lgp(files, lgp_filename)
+
+
+def make_lgp(lgp_filename, entries=1000, size=64 * 1024, seed=0):
+    """Writes an LGP archive with ``entries`` files of ``size`` random bytes each"""
+    random = Random(seed)
+    files = [('file%05d.bin' % i, random.getrandbits(size * 8).to_bytes(size, 'little')) for i in range(entries)]
+    pack_lgp(files, lgp_filename)
+    return files
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+'''
+Benchmark suite over synthetic data
+
+Usage: python -m benchmarks.run [--rounds N] [--entries N] [--entry-size BYTES] [--functions N]
+                                [--output FILE] [--baseline FILE] [--tolerance FRACTION] [--import-budget MS]
+
+Every benchmark is timed over a number of rounds, then run once more under tracemalloc to record its peak memory.
+Results are written as JSON with --output. With --baseline, the results are compared against a previous JSON file
+and the exit code is 1 if any benchmark got slower than the tolerance allows (0.25 by default, i.e. 25%).
+
+Startup is measured separately: every terraform.py command is run under ``python -X importtime`` and the time
+spent importing modules is recorded. With --import-budget, the exit code is 1 if any command spends more than that
+many milliseconds on imports.
+'''
+from contextlib import redirect_stdout
+from io import StringIO
+from json import dump, load
+from os.path import abspath, dirname, join
+from platform import python_version
+from random import Random
+from shutil import copyfile
+from subprocess import run
+from sys import argv, executable, exit
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from tracemalloc import get_traced_memory, start, stop
+
+from benchmarks.corpus import make_lgp, make_messages, make_world
+from extrator import Extractor
+from parse import Parser
+from PyFF7.lgp import LGP, pack_lgp
+from PyFF7.text import decode_field_text, encode_text
+
+TERRAFORM = join(dirname(dirname(abspath(__file__))), 'terraform.py')
+
+
+def get_option(args, name, default):
+    if name in args[:-1]:
+        return type(default)(args[args.index(name) + 1])
+    return default
+
+
+def measure(function, rounds):
+    """Returns the best and mean wall time of ``rounds`` calls, and the peak memory of one more call"""
+    times = []
+    for _ in range(rounds):
+        begin = perf_counter()
+        function()
+        times.append(perf_counter() - begin)
+
+    start()
+    try:
+        function()
+        peak = get_traced_memory()[1]
+    finally:
+        stop()
+
+    return {'best': min(times), 'mean': sum(times) / len(times), 'peak_memory': peak}
+
+
+def benchmarks(directory, entries, entry_size, functions):
+    """Generates the synthetic data in ``directory`` and returns a list of (name, function) tuples to time"""
+    lgp_file = join(directory, 'data.lgp')
+    files = make_lgp(lgp_file, entries, entry_size)
+    world_file = join(directory, 'world.lgp')
+    make_world(join(directory, 'src'), world_file, functions)
+
+    texts = make_messages(Random(0), 5000)
+    messages = [encode_text(message) for message in texts]
+
+    def lgp_open():
+        LGP(lgp_file).close()
+
+    def lgp_load_files():
+        lgp = LGP(lgp_file)
+        for name, data in lgp.load_files():
+            pass
+        lgp.close()
+
+    def lgp_pack():
+        pack_lgp(files, join(directory, 'packed.lgp'))
+
+    def extract():
+        Extractor(world_file, join(directory, 'output'), False).extract()
+
+    def compile_scripts():
+        parser = Parser(join(directory, 'src'))
+        parser.compile()
+        parser.build_files()
+
+    def encode():
+        for message in texts:
+            encode_text(message)
+
+    def decode():
+        for message in messages:
+            decode_field_text(message)
+
+    return [('lgp_open', lgp_open), ('lgp_load_files', lgp_load_files), ('pack_lgp', lgp_pack),
+            ('extract', extract), ('compile', compile_scripts), ('encode_text', encode), ('decode_field_text', decode)]
+
+
+def import_time(args, directory):
+    """Runs terraform.py with ``args`` under ``python -X importtime`` in ``directory``. Returns the time spent
+    importing modules and the number of modules imported."""
+    result = run([executable, '-X', 'importtime', TERRAFORM] + args, cwd=directory, capture_output=True, text=True)
+    total = 0
+    modules = 0
+    for line in result.stderr.splitlines():
+        if line.startswith('import time:') and 'self [us]' not in line:
+            total += int(line.split(':')[1].split('|')[0])
+            modules += 1
+    return total / 1000000, modules
+
+
+def startup(directory, rounds):
+    """Returns the best import time and the number of modules imported by every command, over ``rounds`` runs"""
+    world_file = join(directory, 'world.lgp')
+    output_file = join(directory, 'startup.lgp')
+    copyfile(world_file, output_file)
+    commands = [('usage', []), ('extract', ['extract', world_file]), ('analyze', ['analyze', world_file]),
+                ('compile', ['compile', join(directory, 'src'), output_file, '--no-cache', '--jobs', '1'])]
+
+    results = {}
+    for name, args in commands:
+        times = [import_time(args, directory) for _ in range(rounds)]
+        results[name] = {'imports': min(t[0] for t in times), 'modules': times[0][1]}
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Prints the change of every benchmark against the baseline and returns the names of the regressions"""
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        ratio = result['best'] / baseline[name]['best']
+        memory = result['peak_memory'] / max(baseline[name]['peak_memory'], 1)
+        flag = ''
+        if ratio > 1 + tolerance:
+            regressions.append(name)
+            flag = '  <-- slower'
+        print("%-20s %6.2fx time  %6.2fx memory%s" % (name, ratio, memory, flag))
+    return regressions
+
+
+def main(args):
+    rounds = get_option(args, '--rounds', 5)
+    entries = get_option(args, '--entries', 1000)
+    entry_size = get_option(args, '--entry-size', 16 * 1024)
+    functions = get_option(args, '--functions', 60)
+
+    results = {}
+    with TemporaryDirectory() as directory:
+        for name, function in benchmarks(directory, entries, entry_size, functions):
+            with redirect_stdout(StringIO()):
+                results[name] = measure(function, rounds)
+            print("%-20s best %9.2f ms  mean %9.2f ms  peak %9.1f KiB" % (name, results[name]['best'] * 1000,
+                  results[name]['mean'] * 1000, results[name]['peak_memory'] / 1024))
+
+        print()
+        imports = startup(directory, rounds)
+        for name, result in imports.items():
+            print("startup %-12s imports %9.2f ms  %d modules" % (name, result['imports'] * 1000, result['modules']))
+
+    report = {
+        'python': python_version(),
+        'parameters': {'rounds': rounds, 'entries': entries, 'entry_size': entry_size, 'functions': functions},
+        'results': results,
+        'startup': imports,
+    }
+
+    output = get_option(args, '--output', '')
+    if output:
+        with open(output, 'w') as file:
+            dump(report, file, indent=2)
+
+    baseline_file = get_option(args, '--baseline', '')
+    if baseline_file:
+        with open(baseline_file) as file:
+            baseline = load(file)
+        if baseline['parameters'] != report['parameters']:
+            print("Warning: the baseline was recorded with different parameters: %s" % baseline['parameters'])
+
+        print("\nCompared to %s:" % baseline_file)
+        if compare(results, baseline['results'], get_option(args, '--tolerance', 0.25)):
+            exit(1)
+
+    budget = get_option(args, '--import-budget', 0.0)
+    if budget:
+        over = [name for name, result in imports.items() if result['imports'] * 1000 > budget]
+        for name in over:
+            print("Startup of '%s' spends %.2f ms on imports, over the budget of %g ms" %
+                  (name, imports[name]['imports'] * 1000, budget))
+        if over:
+            exit(1)
+
+
+if __name__ == '__main__':
+    main(argv[1:])
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+'''
+Message encode/decode throughput for a whole mes table
+
+Usage: python -m benchmarks.text [messages.txt] [--rounds N]
+
+Without a messages.txt file, a synthetic table of 500 field messages is used.
+'''
+from random import Random
+from sys import argv
+from time import perf_counter
+
+from PyFF7.text import decode_field_text, encode_text
+
+WORDS = ['Cloud', 'Highwind', 'chocobo', 'the', 'world', 'map', 'Do you want to', 'ride', 'Yes', 'No', 'Gil', '...',
+         'submarine', 'Great Glacier', 'It\'s', 'here', '!', '?', ',']
+COMMANDS = ['{CLOUD}', '{CHOICE}', '{NEW}\n', '\n', '\t', '{RED}', '{WHITE}', '{PAUSE}']
+
+
+def synthetic_messages(count=500, seed=0):
+    random = Random(seed)
+    messages = []
+    for i in range(count):
+        parts = [random.choice(COMMANDS) if random.random() < 0.1 else random.choice(WORDS)
+                 for _ in range(random.randint(2, 30))]
+        messages.append(' '.join(parts).strip())
+    return messages
+
+
+def load_messages(filename):
+    messages = []; message = ''
+    with open(filename) as file:
+        for line in file:
+            if line.startswith('---[ MES'):
+                if message:
+                    messages.append(message.strip())
+                message = ''
+            else:
+                message += line
+    messages.append(message.strip())
+    return messages
+
+
+def measure(function, rounds):
+    best = None
+    for _ in range(rounds):
+        start = perf_counter()
+        function()
+        elapsed = perf_counter() - start
+        best = elapsed if best is None or elapsed < best else best
+    return best
+
+
+def main(args):
+    rounds = int(args[args.index('--rounds') + 1]) if '--rounds' in args else 20
+    files = [arg for arg in args if not arg.startswith('--') and not arg.isdigit()]
+    messages = load_messages(files[0]) if files else synthetic_messages()
+
+    encoded = [encode_text(message) for message in messages]
+    table = b''.join(encoded)
+    offsets = [0]
+    for data in encoded[:-1]:
+        offsets.append(offsets[-1] + len(data))
+
+    encode_time = measure(lambda: [encode_text(message) for message in messages], rounds)
+    decode_time = measure(lambda: [decode_field_text(table[offset:]) for offset in offsets], rounds)
+
+    print("%d messages, %d bytes encoded, best of %d rounds" % (len(messages), len(table), rounds))
+    print("encode_text:       %8.2f ms  %10.0f messages/s  %8.2f MB/s" %
+          (encode_time * 1000, len(messages) / encode_time, len(table) / encode_time / 1e6))
+    print("decode_field_text: %8.2f ms  %10.0f messages/s  %8.2f MB/s" %
+          (decode_time * 1000, len(messages) / decode_time, len(table) / decode_time / 1e6))
+
+
+if __name__ == '__main__':
+    main(argv[1:])
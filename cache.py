@@ -0,0 +1,138 @@
+from os import W_OK, access, listdir, makedirs, remove, replace, stat, utime, getpid
+from os.path import abspath, dirname, isdir, isfile, join
+from hashlib import sha1
+from struct import error as struct_error, pack, unpack_from
+
+from compiler import FunctionObject, toolchain_digest
+
+_codec_digest = None
+
+
+def codec_digest():
+    """Returns a hash of the code that turns messages.txt into the mes file: the text codec and the message layout
+    in the parser. Used as part of the message cache key."""
+    global _codec_digest
+    if _codec_digest is None:
+        h = sha1()
+        directory = dirname(abspath(__file__))
+        for filename in [join(directory, 'PyFF7', 'text.py'), join(directory, 'parse.py')]:
+            with open(filename, 'rb') as f:
+                h.update(f.read())
+        _codec_digest = h.hexdigest()
+    return _codec_digest
+
+
+class CompileCache:
+    """Content-addressed cache of compiled world script functions and encoded message files.
+
+    Each entry is keyed by a hash of the function source and of the toolchain (grammar, compiler and constant
+    tables), so any change to either produces a different key. Entries are evicted least recently used first once
+    the directory grows past ``max_size`` bytes, using file modification times as the access clock.
+    """
+    def __init__(self, directory, max_size):
+        super(CompileCache, self).__init__()
+        self.directory = directory
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        makedirs(directory, exist_ok=True)
+        if not access(directory, W_OK):
+            raise PermissionError("Cache directory is not writable: " + directory)
+
+    def key(self, source):
+        return sha1((toolchain_digest() + source).encode()).hexdigest()
+
+    def message_key(self, text):
+        return sha1((codec_digest() + text).encode()).hexdigest()
+
+    def path(self, key, suffix='.obj'):
+        return join(self.directory, key + suffix)
+
+    def read(self, path):
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            self.misses += 1
+            return None
+
+        try:
+            utime(path)  # mark as recently used
+        except FileNotFoundError:
+            pass
+        self.hits += 1
+        return data
+
+    def remove(self, path):
+        # Another build sharing the cache may have removed it already
+        try:
+            remove(path)
+        except FileNotFoundError:
+            pass
+
+    def write(self, path, data):
+        # Write to a temporary file first, so concurrent builds never see a partial entry
+        tmp = path + '.%d.tmp' % getpid()
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        replace(tmp, path)
+
+    def get(self, key):
+        path = self.path(key)
+        data = self.read(path)
+        if data is None:
+            return None
+
+        try:
+            num_fixups = unpack_from('<H', data)[0]
+            fixups = list(unpack_from('<%dH' % num_fixups, data, 2))
+        except struct_error:
+            fixups = None
+        code = data[2 + len(fixups) * 2:] if fixups is not None else b''
+        if fixups is None or len(code) % 2 != 0 or any(pos >= len(code) // 2 for pos in fixups):
+            # Cut short by a killed build or a full disk: drop it and compile the function again
+            self.hits -= 1
+            self.misses += 1
+            self.remove(path)
+            return None
+
+        return FunctionObject(code, fixups)
+
+    def put(self, key, obj):
+        self.write(self.path(key), pack('<H%dH' % len(obj.fixups), len(obj.fixups), *obj.fixups) + obj.code)
+
+    def get_bytes(self, key):
+        """Returns the raw data stored under ``key`` by put_bytes, or None"""
+        return self.read(self.path(key, '.bin'))
+
+    def put_bytes(self, key, data):
+        self.write(self.path(key, '.bin'), data)
+
+    def entries(self):
+        entries = []
+        for name in listdir(self.directory):
+            if name.endswith('.obj') or name.endswith('.bin'):
+                try:
+                    st = stat(join(self.directory, name))
+                except FileNotFoundError:  # evicted by another build since listdir
+                    continue
+                entries.append((st.st_mtime, st.st_size, name))
+        return entries
+
+    def evict(self):
+        """Removes least recently used entries until the cache fits in ``max_size`` bytes"""
+        entries = sorted(self.entries())
+        total = sum(e[1] for e in entries)
+        for mtime, size, name in entries:
+            if total <= self.max_size:
+                break
+            self.remove(join(self.directory, name))
+            total -= size
+
+    def clear(self):
+        if not isdir(self.directory):
+            return
+        for name in listdir(self.directory):
+            path = join(self.directory, name)
+            if isfile(path):
+                self.remove(path)
@@ -1,130 +1,389 @@
 from sys import exit
-from utils import error
+from os import getpid, makedirs, remove, replace
+from os.path import isfile, join
+from io import StringIO
+from functools import partial
+from hashlib import sha1
+from utils import error, read_word
 from struct import pack
-from lark import Lark, Token, Tree
-from constants import OPCODES, SPECIAL_VARS, SAVEMAP_VARS, FIELD_IDS, MODELS
+from time import perf_counter
+from importlib.util import find_spec
+from constants import OPCODES, SPECIAL_VARS, SAVEMAP_VARS, FIELD_IDS, MODELS, GRAMMAR_FILE, CACHE_DIR
 
+_parser = None
+_session = None
+_digest = None
 
-class Compiler:
-    def __init__(self, file, offset = 0):
-        super(Compiler, self).__init__()
-        self.out = bytearray()
+
+def grammar_cache():
+    """Returns the text of world_script.lark and the name of the file caching its LALR analysis tables, or None when
+    CACHE_DIR can't be created. The name is keyed by the hash of the grammar and the Lark version, so editing the
+    grammar invalidates the cache automatically."""
+    from lark import __version__ as lark_version
+
+    with open(GRAMMAR_FILE) as f:
+        grammar = f.read()
+
+    digest = sha1((lark_version + grammar).encode()).hexdigest()[:16]
+    try:
+        makedirs(CACHE_DIR, exist_ok=True)
+    except OSError:
+        return grammar, None
+    return grammar, join(CACHE_DIR, 'world_script_%s.lark_cache' % digest)
+
+
+def build_parser(transformer=None):
+    """Builds the LALR parser for world_script.lark, running ``transformer`` on every rule if one is given.
+
+    The analysis tables are cached on disk in CACHE_DIR. Lark writes the cache while it builds the tables, so they
+    are built into a file of this process and then moved into place. That way processes starting at the same time
+    never read a partial cache. A cache that fails to load is deleted and built again. When the cache can't be
+    written, the tables are built in memory every time.
+    """
+    from lark import Lark
+
+    grammar, cache_file = grammar_cache()
+    options = {'start': 'program', 'parser': 'lalr', 'lexer': 'standard'}
+    if cache_file is None:
+        return Lark(grammar, transformer=transformer, **options)
+
+    if isfile(cache_file):
+        try:
+            return Lark(grammar, cache=cache_file, transformer=transformer, **options)
+        except Exception:
+            try:
+                remove(cache_file)
+            except FileNotFoundError:
+                pass
+
+    temp_file = '%s.%d.tmp' % (cache_file, getpid())
+    try:
+        if isfile(temp_file):
+            remove(temp_file)  # left by a crashed process with the same pid, Lark would load it
+        parser = Lark(grammar, cache=temp_file, **options)  # the cache must not contain the transformer
+        replace(temp_file, cache_file)
+    except OSError:
+        return Lark(grammar, transformer=transformer, **options)
+    if transformer is None:
+        return parser
+    return Lark(grammar, cache=cache_file, transformer=transformer, **options)
+
+
+def load_parser():
+    """Returns the LALR parser for world_script.lark, producing parse trees. It's built once per process."""
+    global _parser
+    if _parser is None:
+        _parser = build_parser()
+    return _parser
+
+
+def toolchain_digest():
+    """Returns a hash of everything besides the source text that affects compiled output: the grammar, the compiler
+    itself, the Lark version and the opcode/constant tables. Used as part of the compile cache key.
+
+    Lark's version is read from its source instead of importing it, so a run served from the cache never loads
+    Lark at all."""
+    global _digest
+    if _digest is None:
+        h = sha1()
+        for filename in [find_spec('lark').origin, GRAMMAR_FILE, __file__]:
+            with open(filename, 'rb') as f:
+                h.update(f.read())
+        h.update(repr((OPCODES, SPECIAL_VARS, SAVEMAP_VARS, FIELD_IDS, MODELS)).encode())
+        _digest = h.hexdigest()
+    return _digest
+
+
+def default_session():
+    """Returns a process-wide CompilerSession, creating it on first use"""
+    global _session
+    if _session is None:
+        _session = CompilerSession()
+    return _session
+
+
+class FunctionObject:
+    """Relocatable compiled function: bytecode whose jump targets are relative to the function start, plus the word
+    positions of those targets (fixups) that have to be relocated once the final offset is known"""
+    def __init__(self, code, fixups):
+        super(FunctionObject, self).__init__()
+        self.code = code
+        self.fixups = fixups
+
+    def __len__(self):
+        return len(self.code) // 2
+
+    def link(self, offset):
+        """Returns the bytecode relocated to start at word ``offset`` of the code area"""
+        out = bytearray(self.code)
+        for pos in self.fixups:
+            value = pack('<H', read_word(out, pos) + offset)
+            out[pos * 2] = value[0]
+            out[pos * 2 + 1] = value[1]
+
+        return out
+
+
+class CompilerSession:
+    """Holds the parser and the opcode/constant lookup tables, so they are built once and shared by every file
+    compiled through it"""
+    def __init__(self):
+        super(CompilerSession, self).__init__()
         self.opcodes = {**{v[0]: (k, v[1], v[2], v[3]) for k, v in OPCODES.items() if v}}
         self.constants = {**{v: k for k, v in SPECIAL_VARS.items() if v},
                           **{v: k for k, v in SAVEMAP_VARS.items() if v},
                           **{v: k for k, v in FIELD_IDS.items() if v},
                           **{v: k for k, v in MODELS.items() if v}}
+        self.generator = None
+
+    @property
+    def parser(self):
+        # Loaded on first use, so a session that only serves cached functions never touches Lark
+        return load_parser()
+
+    @property
+    def compile_parser(self):
+        """The parser generating code with this session's tables while it parses, built on first use"""
+        if self.generator is None:
+            self.generator = build_parser(CodeGenerator(self))
+        return self.generator
+
+    def compile_file(self, filename, offset = 0):
+        return self.compile_file_object(filename).link(offset)
+
+    def compile_file_object(self, filename):
+        with open(filename) as file:
+            return Compiler(file, 0, self).compile_object()
+
+    def compile_string(self, source, offset = 0, name = '<string>'):
+        return self.compile_string_object(source, name).link(offset)
+
+    def compile_string_object(self, source, name = '<string>'):
+        return Compiler(StringIO(source), 0, self, name).compile_object()
+
+
+class CompileError(Exception):
+    """Raised by CodeGenerator, reported by the Compiler with the name of the file"""
+    def __init__(self, message, line=None):
+        super(CompileError, self).__init__(message)
+        self.line = line
+
+
+class Fragment(bytearray):
+    """Code generated for a statement or an expression. The attributes are only used for statements: ``reset`` when
+    a ResetStack has to precede it, ``jump`` for a trailing jump placeholder ('if' or a label number) and ``label``
+    for the label number it defines."""
+    __slots__ = ('reset', 'jump', 'label', 'line')
+
+    def __init__(self, code=b'', reset=False, jump=None, label=None, line=0):
+        super(Fragment, self).__init__(code)
+        self.reset = reset
+        self.jump = jump
+        self.label = label
+        self.line = line
+
+
+# Expression rules of the grammar and the opcodes they compile to
+EXPRESSIONS = {
+    'expr_lt': 0x60, 'expr_gt': 0x61, 'expr_le': 0x62, 'expr_ge': 0x63, 'expr_eq': 0x70,
+    'expr_neg': 0x15, 'expr_add': 0x40, 'expr_sub': 0x41, 'expr_mul': 0x30,
+    'expr_shl': 0x50, 'expr_shr': 0x51, 'expr_and': 0xb0, 'expr_or': 0xc0,
+}
+
+
+def word(value):
+    return pack('<H', value)
+
+
+class CodeGenerator:
+    """Generates code while the source is being parsed. Lark calls the method named after each rule as soon as the
+    rule is reduced, with the results for its children: a Token for values and variables, a Fragment for everything
+    else. Tokens are told apart as strings, so this module doesn't have to import Lark. The program rule gets the
+    flat list of statements, which the Compiler lays out and links. The generator holds no state besides the lookup
+    tables, so one instance serves every file compiled through a session."""
+    def __init__(self, session):
+        super(CodeGenerator, self).__init__()
+        self.opcodes = session.opcodes
+        self.constants = session.constants
+        # Opcodes compiled differently from a call with the arguments pushed on the stack
+        self.handlers = {
+            0x114: self.savemap_bit,
+            0x118: self.savemap_byte,
+            0x11c: self.savemap_byte,
+            0x201: self.if_opcode,
+            0x204: self.run_model_function,
+        }
+        for name, code in EXPRESSIONS.items():
+            setattr(self, name, partial(self.call, self.opcodes[OPCODES[code][0]]))
+
+    def parse_value(self, token):
+        if not isinstance(token, str):
+            raise CompileError('Expected a value')
+        if token.isdecimal():
+            return int(token)
+        if len(token) > 2 and token[:2] == '0x':
+            return int(token, 0)
+        if token in self.constants:
+            return int(self.constants[token])
+        raise CompileError('Unknown value: ' + token)
+
+    def arguments_code(self, opcode, args):
+        """Returns the code pushing ``args`` on the stack. Opcodes that take a parameter in the code don't push
+        plain values, they are read by the handler."""
+        code = Fragment()
+        params = opcode[2]
+        for arg in args:
+            if isinstance(arg, str):
+                if params == 0:
+                    code += word(0x110)
+                    code += word(self.parse_value(arg))
+            else:
+                code += arg
+        return code
+
+    def call(self, opcode, args):
+        code = self.arguments_code(opcode, args)
+        code += word(opcode[0])
+        if opcode[2] > 0:
+            code += word(self.parse_value(args[0]))
+        return code
+
+    def savemap_bit(self, opcode, args):
+        code = self.arguments_code(opcode, args)
+        code += word(opcode[0])
+        code += word((self.parse_value(args[0]) - 0xBA4) * 8 + int(args[1], 0))
+        return code
+
+    def savemap_byte(self, opcode, args):
+        code = self.arguments_code(opcode, args)
+        code += word(opcode[0])
+        code += word(self.parse_value(args[0]) - 0xBA4)
+        return code
+
+    def if_opcode(self, opcode, args):
+        code = self.arguments_code(opcode, args)
+        code += word(opcode[0])
+        code += word(0xCDAB)  # Placeholder value
+        code.reset = True
+        code.jump = 'if'
+        return code
+
+    def run_model_function(self, opcode, args):
+        code = self.arguments_code(opcode, args[:-1])
+        code += word(0x204 + int(self.parse_value(args[-1])))
+        return code
+
+    def compile_opcode(self, name, args):
+        opcode = self.opcodes[name]
+        return self.handlers.get(opcode[0], self.call)(opcode, args)
+
+    # Grammar rules
+
+    def program(self, children):
+        return children
+
+    def newline(self, children):
+        return None
+
+    def label(self, children):
+        return Fragment(label=int(children[0]))
+
+    def goto_stmt(self, children):
+        return Fragment(word(0x200) + word(0xCDAB), jump=int(children[0]), line=children[0].line)
+
+    def if_stmt(self, children):
+        return self.compile_opcode(OPCODES[0x201][0], children)
+
+    def arguments(self, children):
+        return children
+
+    def opcode(self, children):
+        name, args = children
+        if name not in self.opcodes:
+            raise CompileError('Unknown opcode: ' + name, name.line)
+
+        try:
+            code = self.compile_opcode(name, args)
+        except CompileError as e:
+            if e.line is None:
+                e.line = name.line
+            raise
+
+        code.reset = self.opcodes[name][1] > 0
+        code.line = name.line
+        return code
+
+    def variable(self, children):
+        return children[0]
+
+    def value(self, children):
+        return children[0]
+
+
+class Compiler:
+    def __init__(self, file, offset = 0, session = None, name = None):
+        super(Compiler, self).__init__()
+        if session is None:
+            session = default_session()
+
+        self.out = bytearray()
+        self.session = session
+        self.opcodes = session.opcodes
+        self.constants = session.constants
         self.file = file
+        self.name = name if name is not None else getattr(file, 'name', '<string>')
         self.offset = offset
         self.pos = 0
         self.stack = []
         self.jumps = []
+        self.fixups = []
         self.labels = []
         self.ifs = []
         self.line = 0
+        self.parse_time = 0.0
+        self.codegen_time = 0.0
 
     def error(self, msg):
-        error(msg + ' while parsing ' + self.file.name + ' on line ' + str(self.line))
+        error(msg + ' while parsing ' + self.name + ' on line ' + str(self.line))
         exit(1)
 
     def emit(self, value):
         self.out += pack('<H', value)
         self.pos += 1
 
-    def parse_value(self, value):
-        if isinstance(value, Token) and not str(value).isdecimal():
-            if len(value) > 2 and value[:2] == '0x':
-                return int(value, 0)
-            elif str(value) in self.constants:
-                return int(self.constants[str(value)])
-        else:
-            return int(value)
-
-    def emit_value(self, value):
-        self.emit(self.parse_value(value))
-
-    def emit_opcode(self, opcode):
-        opcode = self.opcodes[opcode]
-        self.emit(opcode[0])
-
-    def emit_expression(self, item):
-        expressions = {
-            'expr_lt': 0x60, 'expr_gt': 0x61, 'expr_le': 0x62,'expr_ge': 0x63, 'expr_eq': 0x70,
-            'expr_neg': 0x15, 'expr_add': 0x40, 'expr_sub': 0x41, 'expr_mul': 0x30,
-            'expr_shl': 0x50, 'expr_shr': 0x51, 'expr_and': 0xb0, 'expr_or': 0xc0,
-        }
-        opcode = OPCODES[expressions[item.data]]
-        self.opcode(opcode[0], item)
-
-    def opcode(self, opcode, args):
-        if self.opcodes[opcode][0] == 0x204:  # RunModelFunction:
-            value = args.children.pop()
-            self.compile_tree(args.children, opcode)
-            self.emit(0x204 + int(value.children[0]))
-            return
-
-        self.compile_tree(args.children, opcode)
-        self.emit_opcode(opcode)
-        if self.opcodes[opcode][0] == 0x114:  # SavemapBit
-            address = self.parse_value(args.children[0].children[0])
-            bit = int(args.children[1].children[0], 0)
-            self.emit_value((address - 0xBA4) * 8 + bit)
-        elif self.opcodes[opcode][0] in [0x118, 0x11c]:  # SavemapByte/SavemapWord
-            address = self.parse_value(args.children[0].children[0])
-            self.emit_value(address - 0xBA4)
-        elif self.opcodes[opcode][0] == 0x201:  # If
-            self.ifs.append(self.pos)
-            self.emit_value(0xCDAB)  # Placeholder value
-        elif self.opcodes[opcode][2] > 0:
-            self.emit_value(args.children[0].children[0])
-
-    def compile_tree(self, tree, parent: str = None):
-        for index, item in enumerate(tree):
-            if parent is None and item != 'ResetStack':
-                self.line += 1
-
-            if item == 'End':
-                self.emit_opcode('Return')
-            elif item == 'EndIf':
-                if len(self.ifs) == 0:
-                    self.error("EndIf without a matching If")
-
-                pos = self.ifs.pop()
-                self.jumps.append((pos, 'if', pos))
-                self.labels.append((self.pos, 'if', pos))
-            elif item == 'ResetStack':
-                self.emit_opcode(OPCODES[0x100][0])
-            elif isinstance(item, Token) and item[0] == '#':
+    def layout(self, statements):
+        """Appends the code of every statement in order, resolving If/EndIf pairs and recording labels and jumps"""
+        for item in statements:
+            if item is None:  # newline
                 continue
-            elif item.data == 'newline':
-                if index == 0 or not isinstance(tree[index - 1], Tree) or tree[index - 1].data != 'newline':
-                    self.line -= 1
 
+            if isinstance(item, str):
+                self.line = item.line
+                if item.type == 'END_KW':
+                    self.emit(self.opcodes['Return'][0])
+                elif item.type == 'ENDIF_KW':
+                    if len(self.ifs) == 0:
+                        self.error("EndIf without a matching If")
+
+                    pos = self.ifs.pop()
+                    self.jumps.append((pos, 'if', pos))
+                    self.labels.append((self.pos, 'if', pos))
                 continue
-            elif item.data == 'if_stmt':
-                opcode = OPCODES[0x201][0]
-                self.opcode(opcode, item)
-            elif item.data == 'goto_stmt':
-                self.emit_opcode(OPCODES[0x200][0])
-                self.jumps.append((self.pos, 'label', int(item.children[0])))
-                self.emit_value(0xCDAB)  # Placeholder value
-            elif item.data == 'label':
-                self.labels.append((self.pos, 'label', int(item.children[0])))
-            elif len(item.data) > 4 and item.data[:5] == 'expr_':
-                self.emit_expression(item)
-            elif item.data == 'value' or item.data == 'variable':
-                if parent and self.opcodes[parent][2] > 0:
-                    continue
-
-                self.emit_opcode(OPCODES[0x110][0])
-                self.emit_value(item.children[0])
-            elif item.data == 'opcode':
-                opcode = item.children[0]
-                args = item.children[1]
-                if not opcode in self.opcodes:
-                    self.error('Unknown opcode: ' + opcode)
-
-                self.opcode(opcode, args)
+
+            if item.label is not None:
+                self.labels.append((self.pos, 'label', item.label))
+                continue
+
+            if item.line:
+                self.line = item.line
+            if item.reset:
+                self.emit(self.opcodes['ResetStack'][0])
+            self.out += item
+            self.pos += len(item) // 2
+            if item.jump == 'if':
+                self.ifs.append(self.pos - 1)
+            elif item.jump is not None:
+                self.jumps.append((self.pos - 1, 'label', item.jump))
 
     def apply_jumps(self):
         for jump in self.jumps:
@@ -136,38 +395,35 @@ class Compiler:
             if label is None:
                 self.error("Label #%d not found" % jump[2])
 
-            value = pack('<H', label[0] + self.offset)
+            value = pack('<H', label[0])
             self.out[jump[0] * 2] = value[0]
             self.out[jump[0] * 2 + 1] = value[1]
-
-    def add_resets(self, tree):
-        new_children = []
-        for item in tree.children:
-            if isinstance(item, Tree):
-                if item.data == 'if_stmt':
-                    new_children.append('ResetStack')
-                elif item.data == 'opcode':
-                    if item.children[0] in self.opcodes:
-                        opcode = self.opcodes[item.children[0]]
-                        if opcode[1] > 0:
-                            new_children.append('ResetStack')
-            new_children.append(item)
-        tree.children = new_children
+            self.fixups.append(jump[0])
 
     def compile(self):
-        with open('world_script.lark') as f:
-            grammar = f.read()
+        return self.compile_object().link(self.offset)
 
-        parser = Lark(grammar, start='program', parser='lalr', lexer='standard')
+    def compile_object(self):
+        """Compiles the file into a relocatable FunctionObject, with jump targets relative to the function start.
+        Code is generated during the parse, so ``parse_time`` includes it. ``codegen_time`` is the time spent laying
+        out the statements and resolving jumps."""
+        # Loaded outside the try block, so a failure to load the parser isn't reported as an error in the file
+        parser = self.session.compile_parser
+        start = perf_counter()
         try:
-            tree = parser.parse(self.file.read())
+            statements = parser.parse(self.file.read())
+        except CompileError as e:
+            self.line = e.line or 0
+            self.error(str(e))
         except Exception as e:
-            print("Parse error while parsing " + self.file.name + ":")
+            print("Parse error while parsing " + self.name + ":")
             print(e)
             exit(1)
-        
-        self.add_resets(tree)
-        self.compile_tree(tree.children)
+        self.parse_time = perf_counter() - start
+
+        start = perf_counter()
+        self.layout(statements)
         self.apply_jumps()
+        self.codegen_time = perf_counter() - start
 
-        return self.out
+        return FunctionObject(bytes(self.out), self.fixups)
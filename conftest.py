@@ -0,0 +1,13 @@
+'''
+Keeps the grammar tables and compile cache written by the tests out of the per-user cache directory
+'''
+from os import environ
+from tempfile import TemporaryDirectory
+
+# Set before the test modules import constants, and inherited by the commands the tests run in subprocesses
+cache_home = TemporaryDirectory()
+environ['XDG_CACHE_HOME'] = cache_home.name
+
+
+def pytest_unconfigure(config):
+    cache_home.cleanup()
@@ -1,5 +1,14 @@
+from os import environ
+from os.path import abspath, dirname, expanduser, join
+
 OUTPUT_DIR = "output"
-TEMP_DIR = "temp"
+
+# Location of the world script grammar, resolved relative to this file so it doesn't depend on the working
+# directory, and of the on-disk cache, in the per-user cache directory so read-only installs work too
+GRAMMAR_FILE = join(dirname(abspath(__file__)), "world_script.lark")
+CACHE_DIR = join(environ.get("XDG_CACHE_HOME") or join(expanduser("~"), ".cache"), "terraform")
+COMPILE_CACHE_DIR = join(CACHE_DIR, "functions")
+COMPILE_CACHE_SIZE = 64 * 1024 * 1024
 
 # Script opcodes, contains also information about number of stack
 # parameters and code parameters
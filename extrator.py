@@ -1,6 +1,6 @@
-import re
 import struct
 
+from sys import exit
 from os import makedirs
 from os.path import isdir, isfile
 
@@ -8,13 +8,29 @@ from PyFF7.lgp import LGP, pack_lgp
 from PyFF7.text import decode_field_text
 
 from constants import *
-from utils import error, log, read_word
+from ir import Instruction, build_cfg
+from profiler import phase
+from utils import error, log, read_word, read_words
 
 VALUE_PREFIX = ""
 
 
+def extract_range(shm_name, size, filename, index, first, last, messages, directory, verbose):
+    """Process pool worker: decompiles and writes functions ``first`` to ``last`` of an ev image in shared memory"""
+    from multiprocessing.shared_memory import SharedMemory
+
+    shm = SharedMemory(name=shm_name)
+    try:
+        extractor = Extractor(None, directory, verbose)
+        extractor.messages = messages
+        extractor.verbose = verbose
+        extractor.extract_scripts((filename, shm.buf[:size]), first, last, index)
+    finally:
+        shm.close()
+
+
 class Extractor:
-    def __init__(self, input_file, output_directory, verbose):
+    def __init__(self, input_file, output_directory, verbose, jobs=1):
         super(Extractor, self).__init__()
         self.lgp_file = input_file
         self.directory = output_directory
@@ -22,81 +38,79 @@ class Extractor:
         self.messages = []
         self.scripts = []
         self.verbose = False
+        self.jobs = jobs
 
-    def dump_functions(self, functions, directory):
+    def dump_functions(self, functions, directory, code):
         directory = self.directory + '/' + directory
-        log("Writing functions to directory: " + directory)
-
-        if not isdir(directory):
-            makedirs(directory)
+        makedirs(directory, exist_ok=True)
 
         for function in functions:
-            name = function[0]
-            opcodes = function[1]
+            with open(directory + '/' + function[0] + '.s', 'w') as outfile:
+                outfile.write(self.format_function(function, code))
+
+    def format_function(self, function, code):
+        """Returns the source of a function decoded by read_functions"""
+        name = function[0]
+        opcodes = function[1]
+
+        if opcodes is None:
+            return '# Dummy function, duplicate of function #' + name[4:7]
+
+        labels = function[2]
+        entry = function[3]
+        lines = []
+
+        # Write headers
+        if entry[0] == FUNCTION_SYSTEM:
+            lines.append('# System Function ID %02d\n' % entry[2])
 
-            if opcodes is None:
-                with open(directory + '/' + name + '.s', 'w') as outfile:
-                    outfile.write('# Dummy function, duplicate of function #' + name[4:7])
-                    outfile.close()
+        elif entry[0] == FUNCTION_MODEL:
+            modelname = MODELS[str(entry[3])] if str(entry[3]) in MODELS else 'Unknown'
+            lines.append('# Model ID %02d (%s), Function ID %02d\n' % (entry[3], modelname, entry[2]))
+
+        elif entry[0] == FUNCTION_MESH:
+            lines.append('# Mesh Function ID %d, Mesh Type %d\n' % (entry[2], entry[3]))
+
+        offset = entry[1] * 2 + 0x400
+        lines.append('# Start offset: 0x%04x\n\n' % offset)
+
+        for opcode in opcodes:
+            indent = '  ' * opcode.indent
+
+            if opcode.start is not None and opcode.pos in labels:
+                text = f"{indent}@LABEL_{labels[opcode.pos]}"
+                lines.append(text + "\n")
+
+            # Skip noisy ResetStack opcodes
+            if opcode.name == OPCODES[0x100][0]:
                 continue
 
-            labels = function[2]
-            entry = function[3]
-            with open(directory + '/' + name + '.s', 'w') as outfile:
-                # Write headers
-                if entry[0] == FUNCTION_SYSTEM:
-                    outfile.write('# System Function ID %02d\n' % entry[2])
-
-                elif entry[0] == FUNCTION_MODEL:
-                    modelname = MODELS[str(entry[3])] if str(entry[3]) in MODELS else 'Unknown'
-                    outfile.write('# Model ID %02d (%s), Function ID %02d\n' % (entry[3], modelname, entry[2]))
-
-                elif entry[0] == FUNCTION_MESH:
-                    outfile.write('# Mesh Function ID %d, Mesh Type %d\n' % (entry[2], entry[3]))
-
-                offset = entry[1] * 2 + 0x400
-                outfile.write('# Start offset: 0x%04x\n\n' % offset)
-
-                for opcode in opcodes:
-                    indent = ''
-                    for i in range(0, opcode[3]):
-                        indent += '  '
-
-                    if opcode[4] is not None and opcode[2] in labels:
-                        idx = labels.index(opcode[2]) + 1
-                        text = f"{indent}@LABEL_{idx}"
-                        outfile.write(text + "\n")
-
-                    # Skip noisy ResetStack opcodes
-                    if opcode[0] == OPCODES[0x100][0]:
-                        continue
-
-                    if opcode[0] == 'If':
-                        text = f"{indent}If {opcode[1][0]} Then"
-                    elif opcode[0] == 'EndIf':
-                        text = f"{indent}EndIf"
-                    elif opcode[0] == 'Return':
-                        text = f"{indent}End"
-                    elif opcode[0] == 'GoTo':
-                        text = f"{indent}GoTo @{opcode[1][0]}"
-                    else:
-                        text = f"{indent}{opcode[0]}({', '.join(opcode[1])})"
-                        if opcode[0] == 'SetWindowMessage':
-                            mess = self.messages[int(opcode[1][0])].replace("\n", " ")
-                            if len(mess) > 50:
-                                mess = mess[:50] + ' ...'
-                            text += ' # ' + mess
-
-                    if self.verbose and opcode[4] is not None:
-                        hex_text = ''
-                        for h in opcode[4]:
-                            hex_text += ' %s' % struct.pack('<H', h).hex()
-
-                        outfile.write('%s# %04x:%s\n' % (indent, opcode[2], hex_text))
-
-                    outfile.write(text + "\n")
-
-                outfile.close()
+            if opcode.name == 'If':
+                text = f"{indent}If {opcode.params[0]} Then"
+            elif opcode.name == 'EndIf':
+                text = f"{indent}EndIf"
+            elif opcode.name == 'Return':
+                text = f"{indent}End"
+            elif opcode.name == 'GoTo':
+                text = f"{indent}GoTo @{opcode.params[0]}"
+            else:
+                text = f"{indent}{opcode.name}({', '.join(opcode.params)})"
+                if opcode.name == 'SetWindowMessage':
+                    mess = self.messages[int(opcode.params[0])].replace("\n", " ")
+                    if len(mess) > 50:
+                        mess = mess[:50] + ' ...'
+                    text += ' # ' + mess
+
+            if self.verbose and opcode.start is not None:
+                hex_text = ''
+                for h in code[opcode.start:opcode.end]:
+                    hex_text += ' %s' % struct.pack('<H', h).hex()
+
+                lines.append('%s# %04x:%s\n' % (indent, opcode.pos, hex_text))
+
+            lines.append(text + "\n")
+
+        return ''.join(lines)
 
     def dump_messages(self, filename):
         filename = self.directory + '/' + filename
@@ -110,12 +124,18 @@ class Extractor:
 
             outfile.close()
 
-    def read_functions(self, index, code):
+    def read_functions(self, index, code, first=0, last=None):
+        """Decodes the functions listed in ``index``. Only functions ``first`` to ``last`` (exclusive) are returned,
+        but the whole index is scanned so duplicate functions are named consistently whichever range is decoded."""
         functions = []
         offsets = {}
         file_id = 0
         for entry in index:
             pos = entry[1]
+            if not first <= file_id < (len(index) if last is None else last):
+                offsets.setdefault(pos, file_id)
+                file_id += 1
+                continue
 
             # System Functions
             name = f'%03d_system_%02d' % (file_id, entry[2])
@@ -134,7 +154,8 @@ class Extractor:
             opcodes = []
             indent = 0
             jumps = []
-            labels = []
+            pending = {}  # number of open If blocks ending at each offset
+            labels = {}
 
             if pos not in offsets:
                 offsets[pos] = file_id
@@ -148,14 +169,15 @@ class Extractor:
             # Read the code until we reach Return opcode
             while opcode[0] != OPCODES[0x203][0]:
                 params = []
+                target = None
                 word = code[pos]
-                words = [word]
+                start = pos
                 pos += 1
 
                 if 0x204 <= word < 0x300:
                     opcode = OPCODES[0x204]
                 elif word not in OPCODES:
-                    opcodes.append(("Unknown%04x" % word, [], pos - 1, indent, words))
+                    opcodes.append(Instruction("Unknown%04x" % word, [], pos - 1, indent, pos - 1, pos))
                     continue
                 else:
                     opcode = OPCODES[word]
@@ -164,12 +186,12 @@ class Extractor:
                 if opcode[1] > 0:
                     for i in range(0, opcode[1]):
                         op = opcodes.pop()
-                        words = op[4] + words
+                        start = op.start
 
                         # If current opcode is 'IsEqual', and its param is a SpecialByte($PlayerEntityModelId)
                         # adjust the second param with a constant for better readibility
-                        if opcode[0] == OPCODES[0x70][0] and op[1][0] == '$' + SPECIAL_VARS['8'] and \
-                                op[0] == OPCODES[0x11b][0]:
+                        if opcode[0] == OPCODES[0x70][0] and op.params[0] == '$' + SPECIAL_VARS['8'] and \
+                                op.name == OPCODES[0x11b][0]:
                             last_param = params.pop()
                             if (VALUE_PREFIX == '' or last_param[0] == VALUE_PREFIX) and last_param[
                                                                                          len(VALUE_PREFIX):] in MODELS:
@@ -179,8 +201,8 @@ class Extractor:
 
                         # If current opcode is 'IsEqual', and its param is a SpecialByte($LastFieldID)
                         # adjust the second param with a constant for better readibility
-                        if opcode[0] == OPCODES[0x70][0] and op[1][0] == '$' + SPECIAL_VARS['6'] and \
-                                op[0] == OPCODES[0x11b][0]:
+                        if opcode[0] == OPCODES[0x70][0] and op.params[0] == '$' + SPECIAL_VARS['6'] and \
+                                op.name == OPCODES[0x11b][0]:
                             last_param = params.pop()
                             if (VALUE_PREFIX == '' or last_param[0] == VALUE_PREFIX) and last_param[len(
                                     VALUE_PREFIX):] in FIELD_IDS:
@@ -189,70 +211,69 @@ class Extractor:
                                 params.append(last_param)
 
                         # Replace constant values with Model constants wherever possible
-                        if word in MODEL_OPCODES and op[0] == OPCODES[0x110][0] and str(op[1][0]) in MODELS:
-                            params.append(f"{VALUE_PREFIX}${MODELS[str(op[1][0])]}")
+                        if word in MODEL_OPCODES and op.name == OPCODES[0x110][0] and str(op.params[0]) in MODELS:
+                            params.append(f"{VALUE_PREFIX}${MODELS[str(op.params[0])]}")
 
                         # Replace constant values with Field IDs constants wherever possible
-                        elif op[0] == OPCODES[0x110][0] and word == 0x318 and i == 1 and str(op[1][0]) in FIELD_IDS:
-                            params.append(f"{VALUE_PREFIX}${FIELD_IDS[str(op[1][0])]}")
+                        elif op.name == OPCODES[0x110][0] and word == 0x318 and i == 1 and str(op.params[0]) in FIELD_IDS:
+                            params.append(f"{VALUE_PREFIX}${FIELD_IDS[str(op.params[0])]}")
 
-                        elif op[0] == OPCODES[0x015][0]:  # Neg
-                            params.append(f"-{op[1][0]}")
+                        elif op.name == OPCODES[0x015][0]:  # Neg
+                            params.append(f"-{op.params[0]}")
 
-                        elif op[0] == OPCODES[0x030][0]:  # Multiply
-                            params.append(f"{op[1][0]} * {op[1][1]}")
+                        elif op.name == OPCODES[0x030][0]:  # Multiply
+                            params.append(f"{op.params[0]} * {op.params[1]}")
 
-                        elif op[0] == OPCODES[0x040][0]:  # Add
-                            params.append(f"{op[1][0]} + {op[1][1]}")
+                        elif op.name == OPCODES[0x040][0]:  # Add
+                            params.append(f"{op.params[0]} + {op.params[1]}")
 
-                        elif op[0] == OPCODES[0x041][0]:  # Sub
-                            params.append(f"{op[1][0]} - {op[1][1]}")
+                        elif op.name == OPCODES[0x041][0]:  # Sub
+                            params.append(f"{op.params[0]} - {op.params[1]}")
 
-                        elif op[0] == OPCODES[0x050][0]:  # ShiftLeft
-                            params.append(f"{op[1][0]} << {op[1][1]}")
+                        elif op.name == OPCODES[0x050][0]:  # ShiftLeft
+                            params.append(f"{op.params[0]} << {op.params[1]}")
 
-                        elif op[0] == OPCODES[0x051][0]:  # ShiftRight
-                            params.append(f"{op[1][0]} >> {op[1][1]}")
+                        elif op.name == OPCODES[0x051][0]:  # ShiftRight
+                            params.append(f"{op.params[0]} >> {op.params[1]}")
 
-                        elif op[0] == OPCODES[0x060][0]:  # IsLessThan
-                            params.append(f"{op[1][0]} < {op[1][1]}")
+                        elif op.name == OPCODES[0x060][0]:  # IsLessThan
+                            params.append(f"{op.params[0]} < {op.params[1]}")
 
-                        elif op[0] == OPCODES[0x061][0]:  # IsGreaterThan
-                            params.append(f"{op[1][0]} > {op[1][1]}")
+                        elif op.name == OPCODES[0x061][0]:  # IsGreaterThan
+                            params.append(f"{op.params[0]} > {op.params[1]}")
 
-                        elif op[0] == OPCODES[0x062][0]:  # IsLessOrEqaulThan
-                            params.append(f"{op[1][0]} <= {op[1][1]}")
+                        elif op.name == OPCODES[0x062][0]:  # IsLessOrEqaulThan
+                            params.append(f"{op.params[0]} <= {op.params[1]}")
 
-                        elif op[0] == OPCODES[0x063][0]:  # IsGreaterOrEqualThan
-                            params.append(f"{op[1][0]} >= {op[1][1]}")
+                        elif op.name == OPCODES[0x063][0]:  # IsGreaterOrEqualThan
+                            params.append(f"{op.params[0]} >= {op.params[1]}")
 
-                        elif op[0] == OPCODES[0x070][0]:  # IsEqual
-                            params.append(f"{op[1][0]} == {op[1][1]}")
+                        elif op.name == OPCODES[0x070][0]:  # IsEqual
+                            params.append(f"{op.params[0]} == {op.params[1]}")
 
-                        elif op[0] == OPCODES[0x80][0]:  # Bit And
-                            params.append(f"{op[1][0]} & {op[1][1]}")
+                        elif op.name == OPCODES[0x80][0]:  # Bit And
+                            params.append(f"{op.params[0]} & {op.params[1]}")
 
-                        elif op[0] == OPCODES[0xa0][0]:  # Bit Or
-                            params.append(f"{op[1][0]} | {op[1][1]}")
+                        elif op.name == OPCODES[0xa0][0]:  # Bit Or
+                            params.append(f"{op.params[0]} | {op.params[1]}")
 
-                        elif op[0] == OPCODES[0xb0][0]:  # AND
-                            params.append(f"{op[1][0]} AND {op[1][1]}")
+                        elif op.name == OPCODES[0xb0][0]:  # AND
+                            params.append(f"{op.params[0]} AND {op.params[1]}")
 
-                        elif op[0] == OPCODES[0xc0][0]:  # OR
-                            params.append(f"{op[1][0]} OR {op[1][1]}")
+                        elif op.name == OPCODES[0xc0][0]:  # OR
+                            params.append(f"{op.params[0]} OR {op.params[1]}")
 
-                        elif op[0] == OPCODES[0x110][0]:  # Value
-                            params.append(f"{VALUE_PREFIX}{op[1][0]}")
+                        elif op.name == OPCODES[0x110][0]:  # Value
+                            params.append(f"{VALUE_PREFIX}{op.params[0]}")
 
                         else:  # other opcodes
-                            params.append(f"{op[0]}({', '.join(op[1])})")
+                            params.append(f"{op.name}({', '.join(op.params)})")
                     params.reverse()
 
                 # Code arguments
                 if opcode[2] > 0:
                     for i in range(0, opcode[2]):
                         word = code[pos]
-                        words.append(word)
 
                         if opcode[0] == OPCODES[0x114][0]:  # SavemapBit
                             bit = word % 8
@@ -276,12 +297,14 @@ class Extractor:
 
                         elif opcode[0] == OPCODES[0x200][0]:  # GoTo
                             if word not in labels:
-                                labels.append(word)
-                            idx = labels.index(word) + 1
-                            params.append(f"LABEL_{str(idx)}")
+                                labels[word] = len(labels) + 1
+                            params.append(f"LABEL_{str(labels[word])}")
+                            target = word
 
                         elif opcode[0] == OPCODES[0x201][0]:  # If
                             jumps.append(word)
+                            pending[word] = pending.get(word, 0) + 1
+                            target = word
                             pos += 1
                             continue
 
@@ -292,54 +315,42 @@ class Extractor:
 
                 if opcode == OPCODES[0x204]:
                     params.append(str(word - 0x204))
-                opcodes.append((opcode[0], params, pos - 1 - opcode[2], indent, words))
+                opcodes.append(Instruction(opcode[0], params, pos - 1 - opcode[2], indent, start, pos, target))
 
                 # De-indent when a jump was made here
-                while pos in jumps:
+                while pending.get(pos):
                     indent -= 1
-                    jumps.pop()
+                    ended = jumps.pop()
+                    pending[ended] -= 1
 
                     # Add a dummy EndIf opcode as a hint for the compiler
-                    opcodes.append(('EndIf', [], pos - 1 - opcode[2], indent, None))
+                    opcodes.append(Instruction('EndIf', [], pos - 1 - opcode[2], indent, None, None))
 
                 # Indent everything after If opcode
                 if opcode[0] == OPCODES[0x201][0]:
                     indent += 1
 
-            functions.append((name, opcodes, labels, entry))
+            functions.append((name, opcodes, labels, entry, build_cfg(opcodes)))
 
         return functions
 
     def read_code(self, script):
-        code = []
-        i = 0x200
-        while i * 2 < len(script):
-            word = read_word(script, i)
-            code.append(word)
-            i += 1
-
-        return code
+        return read_words(script, 0x200)
 
     def read_index(self, script):
-        index = []
-        pos = 2  # skip first dummy entry
-        while pos < 0x200:
-            entry = read_word(script, pos)
-            offset = read_word(script, pos + 1)
-            pos += 2
+        words = read_words(script, 0, 0x200)
+        entries = words[2::2]  # skip first dummy entry
+        offsets = words[3::2]
 
+        index = []
+        for entry, offset in zip(entries, offsets):
             function_type = entry >> 14
             if function_type == FUNCTION_SYSTEM:
-                function_id = entry & 0xFF
-                index.append((FUNCTION_SYSTEM, offset, function_id))
+                index.append((FUNCTION_SYSTEM, offset, entry & 0xFF))
             elif function_type == FUNCTION_MODEL:
-                model_id = (entry >> 8) & 0x3F
-                function_id = entry & 0xFF
-                index.append((FUNCTION_MODEL, offset, function_id, model_id))
+                index.append((FUNCTION_MODEL, offset, entry & 0xFF, (entry >> 8) & 0x3F))
             elif function_type == FUNCTION_MESH:
-                mesh_coords = (entry >> 4) & 0x3FF
-                walkmesh_type = entry & 0xF
-                index.append((FUNCTION_MESH, offset, mesh_coords, walkmesh_type))
+                index.append((FUNCTION_MESH, offset, (entry >> 4) & 0x3FF, entry & 0xF))
             elif entry == 0xFFFF:  # dummy entries
                 continue
             else:
@@ -357,15 +368,45 @@ class Extractor:
             offset = read_word(data, 1 + i)
             self.messages.append(decode_field_text(data[offset:]))
 
-    def extract_scripts(self, file):
+    def extract_scripts(self, file, first=0, last=None, index=None):
         filename = file[0]
         script = file[1]
 
-        index = self.read_index(script)
+        if index is None:
+            index = self.read_index(script)
         code = self.read_code(script)
-        functions = self.read_functions(index, code)
-
-        self.dump_functions(functions, filename)
+        functions = self.read_functions(index, code, first, last)
+
+        self.dump_functions(functions, filename, code)
+
+    def extract_scripts_parallel(self):
+        """Decompiles all ev files on a process pool. Each image is copied once into shared memory, and every worker
+        decodes and writes a disjoint range of its functions, so the output is the same as a serial run."""
+        from concurrent.futures import ProcessPoolExecutor
+        from multiprocessing.shared_memory import SharedMemory
+
+        memories = []
+        try:
+            with ProcessPoolExecutor(max_workers=self.jobs) as pool:
+                tasks = []
+                for filename, script in self.scripts:
+                    log("Writing functions to directory: " + self.directory + '/' + filename)
+                    shm = SharedMemory(create=True, size=len(script))
+                    memories.append(shm)
+                    shm.buf[:len(script)] = script
+
+                    index = self.read_index(script)
+                    step = max(1, -(-len(index) // self.jobs))
+                    for first in range(0, len(index), step):
+                        tasks.append(pool.submit(extract_range, shm.name, len(script), filename, index, first,
+                                                 first + step, self.messages, self.directory, self.verbose))
+
+                for task in tasks:
+                    task.result()
+        finally:
+            for shm in memories:
+                shm.close()
+                shm.unlink()
 
     def extract_messages(self):
         data = self.messages_file[1]
@@ -373,24 +414,39 @@ class Extractor:
         self.dump_messages('messages.txt')
 
     def extract(self):
-        lgp = LGP(self.lgp_file)
-
-        if not isdir(self.directory):
-            makedirs(self.directory)
-
-        files = lgp.load_files()
-        for i, e in enumerate(files):
-            if re.match("wm\d.ev", e[0]):
-                self.scripts.append(e)
-            if e[0] == 'mes' or e[0] == '/mes':
-                self.messages_file = e
-
-        if not self.messages_file:
-            error("Messages file 'mes' not found inside %s!" % self.lgp_file)
-            exit(1)
-
-        self.extract_messages()
+        with phase('read lgp'):
+            lgp = LGP(self.lgp_file, use_mmap=True)
+
+            if not isdir(self.directory):
+                makedirs(self.directory)
+
+            for name in ['wm0.ev', 'wm2.ev', 'wm3.ev']:
+                if lgp.get(name) is None:
+                    error("Script file '%s' not found inside %s!" % (name, self.lgp_file))
+                    exit(1)
+                self.scripts.append((name, lgp.open_entry(name)))
+
+            if lgp.get('mes') is None:
+                error("Messages file 'mes' not found inside %s!" % self.lgp_file)
+                exit(1)
+            self.messages_file = ('mes', lgp.open_entry('mes'))
+
+        with phase('messages', len(self.messages_file[1])):
+            self.extract_messages()
+
+        if self.jobs != 1:
+            try:
+                import multiprocessing.shared_memory  # noqa: F401
+            except ImportError:  # Python < 3.8
+                log("Shared memory isn't available, extracting scripts serially")
+                self.jobs = 1
+
+        if self.jobs != 1:
+            with phase('extract scripts', sum(len(script) for name, script in self.scripts)):
+                self.extract_scripts_parallel()
+            return
 
         for i in range(0, 3):
-            self.extract_scripts(self.scripts[i])
-
+            log("Writing functions to directory: " + self.directory + '/' + self.scripts[i][0])
+            with phase('extract ' + self.scripts[i][0], len(self.scripts[i][1])):
+                self.extract_scripts(self.scripts[i])
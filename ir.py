@@ -0,0 +1,61 @@
+from constants import OPCODES
+
+
+class Instruction:
+    """Decoded world script instruction. ``pos`` is the word offset of the opcode itself, while ``start`` and ``end``
+    span every word it was decoded from in the code buffer, including its stack and code arguments. ``target`` is the
+    jump target of If and GoTo instructions."""
+    __slots__ = ('name', 'params', 'pos', 'indent', 'start', 'end', 'target')
+
+    def __init__(self, name, params, pos, indent, start, end, target=None):
+        self.name = name
+        self.params = params
+        self.pos = pos
+        self.indent = indent
+        self.start = start
+        self.end = end
+        self.target = target
+
+
+class BasicBlock:
+    """Run of instructions ``[first, last)`` with a single entry and exit. ``successors`` holds the indexes of the
+    blocks that execution can continue in: fall-through first, then the jump target."""
+    __slots__ = ('first', 'last', 'successors')
+
+    def __init__(self, first, last):
+        self.first = first
+        self.last = last
+        self.successors = []
+
+
+def build_cfg(instructions):
+    """Splits the instructions of a function into basic blocks linked by If, GoTo and fall-through edges.
+    Jumps to offsets that don't start an instruction of the function are ignored."""
+    starts = {}
+    for i, ins in enumerate(instructions):
+        if ins.start is not None and ins.start not in starts:
+            starts[ins.start] = i
+
+    leaders = {0}
+    for i, ins in enumerate(instructions):
+        if ins.name in (OPCODES[0x200][0], OPCODES[0x201][0], OPCODES[0x203][0]):
+            leaders.add(i + 1)
+        if ins.target in starts:
+            leaders.add(starts[ins.target])
+    leaders = sorted(i for i in leaders if i < len(instructions))
+
+    blocks = []
+    block_of = {}
+    for n, first in enumerate(leaders):
+        last = leaders[n + 1] if n + 1 < len(leaders) else len(instructions)
+        block_of[first] = n
+        blocks.append(BasicBlock(first, last))
+
+    for n, block in enumerate(blocks):
+        ins = instructions[block.last - 1]
+        if ins.name != OPCODES[0x200][0] and ins.name != OPCODES[0x203][0] and n + 1 < len(blocks):
+            block.successors.append(n + 1)
+        if ins.target in starts:
+            block.successors.append(block_of[starts[ins.target]])
+
+    return blocks
@@ -0,0 +1,137 @@
+'''
+Peephole optimizer for compiled world script functions
+'''
+
+from compiler import FunctionObject
+from constants import OPCODES
+from utils import read_words
+
+RESET_STACK = 0x100
+VALUE = 0x110
+GOTO = 0x200
+
+# Operations folded when both operands are constants. Folding only happens when the operands and the result are in
+# 0..0x7FFF, since the way the game handles negative and large values isn't known.
+FOLDS = {
+    0x30: lambda a, b: a * b,
+    0x40: lambda a, b: a + b,
+    0x41: lambda a, b: a - b,
+    0x50: lambda a, b: a << b if b < 16 else -1,
+    0x51: lambda a, b: a >> b if b < 16 else -1,
+    0x80: lambda a, b: a & b,
+    0xa0: lambda a, b: a | b,
+}
+
+
+def param_count(word):
+    if word in OPCODES:
+        return OPCODES[word][2]
+    return 0
+
+
+def stack_effect(word):
+    """Returns the number of values an opcode pops from and pushes onto the stack, or None if it's not known"""
+    if 0x204 <= word < 0x300:  # RunModelFunction
+        return 1, 0
+    if word not in OPCODES or word == RESET_STACK:
+        return None
+
+    name, pops, params, statement = OPCODES[word]
+    if statement:
+        return pops, 0
+    if word < 0x100:  # expressions
+        return pops, 1
+    if VALUE <= word < 0x120:  # values and variables
+        return 0, 1
+    return None
+
+
+def decode(code):
+    """Splits function bytecode into a list of (position, opcode, params) tuples"""
+    words = read_words(code)
+    instructions = []
+    pos = 0
+    while pos < len(words):
+        count = param_count(words[pos])
+        instructions.append((pos, words[pos], list(words[pos + 1:pos + 1 + count])))
+        pos += 1 + count
+    return instructions
+
+
+def optimize(obj):
+    """Returns an optimized copy of a FunctionObject:
+
+    * constant expressions like ``Value(2) Value(3) Add`` are folded into a single Value
+    * ResetStack opcodes are removed where the stack is known to be empty already
+    * a GoTo to the very next instruction is removed
+
+    Jump targets and fixups are updated for the new positions. Instructions that are jumped to are never merged
+    with the ones before them, and the stack is considered unknown there.
+    """
+    words = read_words(obj.code)
+    fixups = set(obj.fixups)
+    targets = {words[pos] for pos in fixups}
+
+    out = []  # kept instructions as (original position, opcode, params)
+    aliases = []  # removed jump targets, which map to the next kept instruction
+    mapping = {}  # jump targets to their index in out
+    depth = None  # number of values on the stack, None when unknown
+
+    for pos, word, params in decode(obj.code):
+        if pos in targets:
+            depth = None
+
+        if word in FOLDS and pos not in targets and len(out) >= 2 and out[-1][1] == VALUE \
+                and out[-2][1] == VALUE and out[-1][0] not in targets:
+            a, b = out[-2][2][0], out[-1][2][0]
+            result = FOLDS[word](a, b)
+            if a <= 0x7FFF and b <= 0x7FFF and 0 <= result <= 0x7FFF:
+                out.pop()
+                out[-1] = (out[-1][0], VALUE, [result])
+                if depth is not None:
+                    depth -= 1
+                continue
+
+        if word == RESET_STACK and depth == 0 or word == GOTO and pos + 1 in fixups and words[pos + 1] == pos + 2:
+            if pos in targets:
+                aliases.append(pos)
+            continue
+
+        for alias in aliases:
+            mapping[alias] = len(out)
+        aliases = []
+        if pos in targets:
+            mapping[pos] = len(out)
+        out.append((pos, word, params))
+
+        effect = stack_effect(word)
+        if word == RESET_STACK:
+            depth = 0
+        elif depth is not None and effect is not None and effect[0] <= depth:
+            depth += effect[1] - effect[0]
+        else:
+            depth = None
+
+    # Assign the new positions
+    positions = []
+    size = 0
+    for pos, word, params in out:
+        positions.append(size)
+        size += 1 + len(params)
+
+    new_pos = {pos: positions[index] for pos, index in mapping.items()}
+    new_pos[len(words)] = size
+    for alias in aliases:
+        new_pos[alias] = size
+
+    code = bytearray()
+    new_fixups = []
+    for (pos, word, params), start in zip(out, positions):
+        code += word.to_bytes(2, 'little')
+        for i, param in enumerate(params):
+            if pos + 1 + i in fixups:
+                new_fixups.append(start + 1 + i)
+                param = new_pos[param]
+            code += param.to_bytes(2, 'little')
+
+    return FunctionObject(bytes(code), new_fixups)
@@ -1,13 +1,73 @@
 #!/usr/bin/env python3
 
 from sys import exit
-from os import walk
+from os import stat, walk
 from os.path import isfile, isdir
+from io import StringIO
 
 from PyFF7.text import encode_text
-from compiler import Compiler
+from compiler import Compiler, default_session
+from optimizer import optimize
+from profiler import phase, record_file
 from utils import log, error, write_word, write_bytes
 
+MES_SIZE = 0x1000
+EV_SIZE = 0x7000
+INDEX_SIZE = 0x200  # words, the first two are unused
+CODE_START = 0x200  # word where the code area starts
+MAX_FUNCTIONS = (INDEX_SIZE - 2) // 2
+
+
+def compile_function(path, session=None):
+    """Compiles a single .s file into a relocatable FunctionObject. Returns the object and the seconds spent parsing
+    and generating code. Also used as the process pool worker, with the process-wide session."""
+    with open(path) as file:
+        compiler = Compiler(file, 0, session or default_session())
+        obj = compiler.compile_object()
+    return obj, compiler.parse_time, compiler.codegen_time
+
+
+def layout_messages(messages):
+    """Lays out encoded messages for the mes file. Identical messages are stored once, and a message that is the
+    tail of another one points into it. Returns the offset of every message into the string data, and the data."""
+    # With the messages sorted by their reversed bytes, a message that ends another one comes right after it
+    owners = {}
+    previous = None
+    for text in sorted(set(messages), key=lambda m: m[::-1], reverse=True):
+        if previous is not None and previous.endswith(text):
+            owners[text] = owners.get(previous, previous)
+        previous = text
+
+    data = bytearray()
+    offsets = {}
+    for text in messages:
+        if text not in offsets and text not in owners:
+            offsets[text] = len(data)
+            data += text
+
+    for text, owner in owners.items():
+        offsets[text] = offsets[owner] + len(owner) - len(text)
+
+    return [offsets[text] for text in messages], bytes(data)
+
+
+def function_ident(name):
+    """Returns the index ID and, for duplicates, the number of the aliased function of a .s file name"""
+    function = name[:name.index(".")].split("_")
+    if function[1] == 'system':
+        ident = int(function[2])
+    elif function[1] == 'model':
+        ident = int(function[3]) | int(function[2]) << 8 | 0x4000
+    else:
+        x = int(function[2])
+        z = int(function[3])
+        type = int(function[4])
+        coords = x * 36 + z
+        ident = type | coords << 4 | 0x8000
+
+    alias = function[0].split("-")[1] if len(function[0]) > 3 else None
+    return ident, alias
+
 
 class Parser(object):
     directory = None
@@ -15,23 +75,57 @@ class Parser(object):
     scripts = []
     message_line = 0
 
-    def __init__(self, input_directory):
+    def __init__(self, input_directory, jobs=1, cache=None, optimize=False):
         super(Parser, self).__init__()
         self.directory = input_directory
-
-    def store_message(self, message):
-        encoded = ''
+        self.jobs = jobs
+        self.cache = cache
+        self.optimize = optimize
+        self.encoded = {}
+        self.messages_key = None
+        self.mes = None
+        self.plans = None
+        self.session = None
+        self.compiled = {}
+
+    def store_message(self, message, line=None):
         id = len(self.messages)
-
-        try:
-            encoded = encode_text(message.strip())
-        except ValueError as e:
-            error(f"In message ID {id}:\n" + str(e))
-            exit(1)
+        text = message.strip()
+
+        encoded = self.encoded.get(text)
+        if encoded is None:
+            try:
+                encoded = encode_text(text)
+            except ValueError as e:
+                where = f"In message ID {id}" + (f" (messages.txt line {line})" if line is not None else "")
+                error(where + ":\n" + str(e))
+                exit(1)
+            self.encoded[text] = encoded
 
         self.messages.append(encoded)
 
+    @staticmethod
+    def read_messages(file):
+        """Splits a messages.txt stream into a list of (line number, text) tuples, one for each message"""
+        messages = []
+        lines = []
+        start = 1
+        for number, line in enumerate(file, 1):
+            if line[:8] == '---[ MES':
+                if number > 1:
+                    messages.append((start, ''.join(lines)))
+                lines = []
+                start = number + 1
+                continue
+
+            lines.append(line)
+
+        messages.append((start, ''.join(lines)))
+        return messages
+
     def load_messages(self):
+        """Reads and encodes messages.txt. Encoded messages are kept by text, so only new or edited messages are
+        encoded again, and a messages.txt identical to the one of the previous build reuses its mes file as is."""
         log("Reading messages...")
 
         filename = self.directory + '/messages.txt'
@@ -39,31 +133,96 @@ class Parser(object):
             error("messages.txt not found in input directory.")
             exit(1)
 
-        num = 0
-        message = ''
-
-        with open(filename, 'r') as file:
-            while True:
-                line = file.readline()
-                if line[:8] == '---[ MES':
-                    if num > 0:
-                        self.store_message(message)
-                        message = ''
-                    num += 1
-                    continue
-
-                if line == '':
-                    self.store_message(message)
-                    break
-
-                message += line
-                num += 1
+        with phase('messages') as current:
+            with open(filename, 'r') as file:
+                text = file.read()
+            current.bytes = len(text)
+            self.encode_messages(text)
+
+    def encode_messages(self, text):
+        """Encodes the contents of a messages.txt file, unless they're the same as in the last call"""
+        key = self.cache.message_key(text) if self.cache is not None else text
+        if key == self.messages_key and self.mes is not None:
+            return
+
+        self.messages_key = key
+        self.mes = self.cache.get_bytes(key) if self.cache is not None else None
+        if self.mes is not None:
+            return
+
+        self.messages = []
+        for line, message in self.read_messages(StringIO(text)):
+            self.store_message(message, line)
+
+    def compile_functions(self, paths):
+        """Compiles every file in ``paths`` into relocatable objects, using a process pool when ``jobs`` is not 1.
+        Functions no longer depend on each other's offsets, so the order of completion doesn't matter. When a
+        compile cache is set, only the files whose source isn't in the cache are compiled. Files whose modification
+        time and size haven't changed since the previous call are not read at all. The caches always hold
+        unoptimized code, the optimizer runs afterwards when enabled."""
+        objects = [None] * len(paths)
+        keys = [None] * len(paths)
+        stats = [None] * len(paths)
+
+        # Files unchanged since the last call on this parser are taken as they are
+        for i, path in enumerate(paths):
+            st = stat(path)
+            stats[i] = (st.st_mtime_ns, st.st_size)
+            if path in self.compiled and self.compiled[path][0] == stats[i]:
+                objects[i] = self.compiled[path][1]
+        reused = sum(obj is not None for obj in objects)
+
+        if self.cache is not None:
+            with phase('cache lookup'):
+                for i, path in enumerate(paths):
+                    if objects[i] is not None:
+                        continue
+                    with open(path) as file:
+                        keys[i] = self.cache.key(file.read())
+                    objects[i] = self.cache.get(keys[i])
+
+        missing = [i for i in range(len(paths)) if objects[i] is None]
+        if missing and self.session is None:
+            # Loaded before any worker starts, so the workers find the grammar cache written (and inherit the
+            # parser when they are forked) instead of all building it at once
+            self.session = default_session()
+            with phase('load parser'):
+                self.session.compile_parser
+
+        with phase('compile') as current:
+            if self.jobs == 1 or len(missing) < 2:
+                compiled = [compile_function(paths[i], self.session) for i in missing]
+            else:
+                from concurrent.futures import ProcessPoolExecutor
+                with ProcessPoolExecutor(max_workers=self.jobs) as pool:
+                    compiled = list(pool.map(compile_function, [paths[i] for i in missing], chunksize=16))
+
+            for i, (obj, parse_time, codegen_time) in zip(missing, compiled):
+                objects[i] = obj
+                current.bytes += len(obj.code)
+                record_file(paths[i], parse_time, codegen_time, len(obj.code))
+                if self.cache is not None:
+                    self.cache.put(keys[i], obj)
+
+        self.compiled = {path: (stats[i], objects[i]) for i, path in enumerate(paths)}
+        if self.cache is not None:
+            self.cache.evict()
+        if self.cache is not None or reused:
+            log("Compiled %d functions, %d taken from cache" % (len(missing), len(paths) - len(missing)))
+
+        if self.optimize:
+            size = sum(len(obj) for obj in objects)
+            with phase('optimize', size * 2):
+                objects = [optimize(obj) for obj in objects]
+            log("Optimized functions from %d to %d bytes" % (size * 2, sum(len(obj) for obj in objects) * 2))
+
+        return objects
 
     def load_scripts(self):
         log("Reading scripts...")
+        scripts = []
         for script in ['wm0.ev', 'wm2.ev', 'wm3.ev']:
             directory = self.directory + '/' + script
-            functions = []
             if not isdir(directory):
                 error("Script directory not found: " + directory)
                 exit(1)
@@ -79,83 +238,154 @@ class Parser(object):
 
                 files.sort()
 
-            offset = 1
-            for filename in files:
-                with open(directory + '/' + filename) as file:
-                    compiler = Compiler(file, offset)
-                    code = compiler.compile()
-                    offset += int(len(code) / 2)
-                    functions.append((filename, code))
+            if len(files) > MAX_FUNCTIONS:
+                error("Too many functions in %s: %d, the index has room for %d" % (script, len(files), MAX_FUNCTIONS))
+                exit(1)
+
+            scripts.append((script, [directory + '/' + file for file in files], files))
 
+        objects = self.compile_functions([path for script in scripts for path in script[1]])
+
+        self.plans = None
+        self.scripts = []
+        pos = 0
+        for script, paths, files in scripts:
+            functions = list(zip(files, objects[pos:pos + len(files)]))
+            pos += len(files)
             self.scripts.append((script, functions))
 
     def compile(self):
         self.load_messages()
         self.load_scripts()
 
-    def write_messages(self, directory):
-        filename = directory + '/mes'
-        data = bytearray(0x1000)
-        num_entries = len(self.messages)
+    def build_messages(self):
+        """Returns the encoded mes file"""
+        if self.mes is not None:
+            return self.mes
+
+        with phase('build mes', MES_SIZE):
+            num_entries = len(self.messages)
+            offsets, strings = layout_messages(self.messages)
+            start = 2 + num_entries * 2
+            size = start + len(strings)
+            if size > MES_SIZE:
+                largest = sorted(range(num_entries), key=lambda i: len(self.messages[i]), reverse=True)[:5]
+                error("Messages don't fit in the mes file: %d bytes needed, %d available. Largest messages: %s" %
+                      (size, MES_SIZE, ', '.join("ID %d (%d bytes)" % (i, len(self.messages[i])) for i in largest)))
+                exit(1)
+
+            saved = sum(len(message) for message in self.messages) - len(strings)
+            log("Messages use %d of %d bytes (%d bytes saved by sharing)" % (size, MES_SIZE, saved))
 
-        write_word(data, 0, num_entries)
+            data = bytearray(MES_SIZE)
+            write_word(data, 0, num_entries)
 
-        # Write offsets
-        offset = 2 + num_entries * 2
-        for i in range(0, num_entries):
-            write_word(data, i + 1, offset)
-            write_bytes(data, offset, self.messages[i])
-            offset += len(self.messages[i])
+            # Write offsets
+            for i in range(0, num_entries):
+                write_word(data, i + 1, start + offsets[i])
 
-        with open(filename, 'wb') as file:
-            file.write(data)
+            data[start:size] = strings
+            self.mes = bytes(data)
+            if self.cache is not None:
+                self.cache.put_bytes(self.messages_key, self.mes)
 
-    def write_scripts(self, directory):
+            return self.mes
+
+    def plan_scripts(self):
+        """Computes where every function goes in the wmX.ev files before anything is written. Returns a list of
+        (filename, entries, code size in words) tuples, where entries are (name, ident, offset, size, alias) tuples
+        with offsets and sizes in words. Exits listing the largest functions when the code doesn't fit."""
+        plans = []
+        failed = False
         for script, functions in self.scripts:
-            filename = directory + '/' + script
-            data = bytearray(0x7000)
-            index_pos = 2
-            offset = 1
+            entries = []
             offsets = {}
-
-            # First dummy function
-            write_word(data, 0x200, 0x203)
+            offset = 1  # after the dummy function
 
             for name, code in functions:
-                function = name[:name.index(".")].split("_")
-                if function[1] == 'system':
-                    ident = int(function[2])
-                elif function[1] == 'model':
-                    ident = int(function[3]) | int(function[2]) << 8 | 0x4000
-                else:
-                    x = int(function[2])
-                    z = int(function[3])
-                    type = int(function[4])
-                    coords = x * 36 + z
-                    ident = type | coords << 4 | 0x8000
-
-                write_word(data, index_pos, ident)
-                if len(function[0]) > 3:
-                    ids = function[0].split("-")
-                    write_word(data, index_pos + 1, offsets[ids[1]])
-                    index_pos += 2
+                ident, alias = function_ident(name)
+                if alias is not None:
+                    if alias not in offsets:
+                        error("Function %s in %s is a duplicate of missing function #%s" % (name, script, alias))
+                        exit(1)
+                    entries.append((name, ident, offsets[alias], 0, alias))
                     continue
-                else:
-                    offsets[function[0]] = offset
 
-                write_word(data, index_pos + 1, offset)
-                write_bytes(data, 0x400 + offset * 2, code)
-                index_pos += 2
-                offset += int(len(code) / 2)
+                offsets[name[:name.index("_")]] = offset
+                entries.append((name, ident, offset, len(code), None))
+                offset += len(code)
 
-            while index_pos < 0x200:
-                write_word(data, index_pos, 0xFFFF)
-                write_word(data, index_pos + 1, 0)
-                index_pos += 2
+            available = EV_SIZE // 2 - CODE_START
+            log("%s: %d of %d functions, %d of %d bytes of code (%.1f%%)" %
+                (script, len(entries), MAX_FUNCTIONS, offset * 2, available * 2, offset * 100 / available))
+            if offset > available:
+                largest = sorted(entries, key=lambda e: e[3], reverse=True)[:5]
+                error("Code doesn't fit in %s: %d bytes needed, %d available. Largest functions: %s" %
+                      (script, offset * 2, available * 2, ', '.join("%s (%d bytes)" % (e[0], e[3] * 2) for e in largest)))
+                failed = True
 
-            with open(filename, 'wb') as file:
-                file.write(data)
+            plans.append((script, entries, offset))
+
+        if failed:
+            exit(1)
+
+        return plans
+
+    def write_map(self, filename):
+        """Writes a map file listing the index ID, offset, size and alias of every function in each wmX.ev file"""
+        if self.plans is None:
+            self.plans = self.plan_scripts()
+
+        with open(filename, 'w') as file:
+            for script, entries, size in self.plans:
+                file.write("%s: %d functions, %d of %d bytes of code\n" %
+                           (script, len(entries), size * 2, EV_SIZE - CODE_START * 2))
+                file.write("  %-24s %-6s %-6s %-6s %6s  %s\n" % ('function', 'ident', 'offset', 'file', 'size', 'alias'))
+                for name, ident, offset, size, alias in entries:
+                    file.write("  %-24s 0x%04x 0x%04x 0x%04x %6d  %s\n" %
+                               (name, ident, offset, (CODE_START + offset) * 2, size * 2, alias or '-'))
+                file.write("\n")
+
+    def build_scripts(self):
+        """Returns a list of (filename, data) tuples with the linked wmX.ev images"""
+        if self.plans is None:
+            with phase('layout'):
+                self.plans = self.plan_scripts()
+
+        images = []
+        for (script, entries, code_size), (_, functions) in zip(self.plans, self.scripts):
+            with phase('build ' + script, EV_SIZE):
+                images.append((script, self.build_script(entries, functions)))
+
+        return images
+
+    def build_script(self, entries, functions):
+        """Links the functions into a wmX.ev image according to the planned layout"""
+        data = bytearray(EV_SIZE)
+        index_pos = 2
+
+        # First dummy function
+        write_word(data, CODE_START, 0x203)
+
+        for (name, ident, offset, size, alias), (_, code) in zip(entries, functions):
+            write_word(data, index_pos, ident)
+            write_word(data, index_pos + 1, offset)
+            index_pos += 2
+            if alias is None:
+                write_bytes(data, (CODE_START + offset) * 2, code.link(offset))
+
+        while index_pos < INDEX_SIZE:
+            write_word(data, index_pos, 0xFFFF)
+            write_word(data, index_pos + 1, 0)
+            index_pos += 2
+
+        return bytes(data)
+
+    def build_files(self):
+        """Returns a list of (filename, data) tuples with every file that goes into the world LGP archive"""
+        return [('mes', self.build_messages())] + self.build_scripts()
 
     def write_files(self, directory):
-        self.write_messages(directory)
-        self.write_scripts(directory)
+        for name, data in self.build_files():
+            with open(directory + '/' + name, 'wb') as file:
+                file.write(data)
@@ -0,0 +1,126 @@
+'''
+Per-phase timing of extract and compile runs
+'''
+
+from os.path import basename, dirname
+from time import perf_counter, process_time
+
+_active = None
+
+
+class Phase:
+    """Times a block of code. ``bytes`` can be increased inside the block to record the amount of data it
+    processed. Phases are recorded only while a Profiler is enabled."""
+    __slots__ = ('name', 'bytes', 'wall', 'cpu', 'profiler', 'profile', 'start', 'cpu_start')
+
+    def __init__(self, name, size, profiler):
+        self.name = name
+        self.bytes = size
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.profiler = profiler
+        self.profile = None
+
+    def __enter__(self):
+        if self.profiler is not None and self.profiler.capture == self.name:
+            from cProfile import Profile
+            self.profile = Profile()
+            self.profile.enable()
+        self.start = perf_counter()
+        self.cpu_start = process_time()
+        return self
+
+    def __exit__(self, *exc):
+        self.wall = perf_counter() - self.start
+        self.cpu = process_time() - self.cpu_start
+        if self.profile is not None:
+            self.profile.disable()
+            self.profiler.profiles.append(self.profile)
+        if self.profiler is not None:
+            self.profiler.phases.append(self)
+        return False
+
+
+class Profiler:
+    """Collects the phases of a run and the compile times of every .s file. The file times are also added up for
+    each directory, which gives the compile time and code size of each wmX.ev file.
+
+    When ``capture`` is the name of a phase, that phase also runs under cProfile and the statistics can be saved
+    with write_stats. Work done by worker processes isn't seen by cProfile, so use a single job for that.
+    """
+    def __init__(self, capture=None):
+        super(Profiler, self).__init__()
+        self.capture = capture
+        self.phases = []
+        self.files = []
+        self.profiles = []
+        self.start = perf_counter()
+        self.cpu_start = process_time()
+
+    def phase(self, name, size=0):
+        return Phase(name, size, self)
+
+    def record_file(self, path, parse, codegen, size=0):
+        self.files.append((path, parse, codegen, size))
+
+    def report(self, slowest=10):
+        scripts = {}
+        for path, parse, codegen, size in self.files:
+            script = scripts.setdefault(basename(dirname(path)), {'count': 0, 'parse': 0.0, 'codegen': 0.0, 'bytes': 0})
+            script['count'] += 1
+            script['parse'] += parse
+            script['codegen'] += codegen
+            script['bytes'] += size
+
+        files = sorted(self.files, key=lambda f: f[1] + f[2], reverse=True)
+        return {
+            'wall': perf_counter() - self.start,
+            'cpu': process_time() - self.cpu_start,
+            'phases': [{'name': p.name, 'wall': p.wall, 'cpu': p.cpu, 'bytes': p.bytes} for p in self.phases],
+            'files': {
+                'count': len(files),
+                'parse': sum(f[1] for f in files),
+                'codegen': sum(f[2] for f in files),
+                'slowest': [{'path': f[0], 'parse': f[1], 'codegen': f[2]} for f in files[:slowest]],
+            },
+            'scripts': scripts,
+        }
+
+    def write(self, filename):
+        from json import dump
+        with open(filename, 'w') as file:
+            dump(self.report(), file, indent=2)
+
+    def write_stats(self, filename):
+        """Saves the cProfile statistics of the captured phase, returns False if it never ran"""
+        if not self.profiles:
+            return False
+
+        from pstats import Stats
+        stats = Stats(self.profiles[0])
+        for profile in self.profiles[1:]:
+            stats.add(profile)
+        stats.dump_stats(filename)
+        return True
+
+
+def enable(profiler):
+    """Makes ``profiler`` record the phases of everything that runs from now on"""
+    global _active
+    _active = profiler
+
+
+def disable():
+    global _active
+    _active = None
+
+
+def phase(name, size=0):
+    """Returns a context manager timing a phase of the enabled profiler, if any"""
+    return Phase(name, size, _active)
+
+
+def record_file(path, parse, codegen, size=0):
+    """Records the parse and code generation times of a .s file and the size of its code in bytes"""
+    if _active is not None:
+        _active.record_file(path, parse, codegen, size)
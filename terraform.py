@@ -7,21 +7,26 @@ by Maciej "mav" Trebacz
 '''
 
 from sys import argv, exit
-from os import makedirs
-from os.path import isdir, isfile
+from time import perf_counter
+from os import cpu_count, replace
+from os.path import getsize, isdir, isfile, splitext
 
-from extrator import Extractor
-from parse import Parser
+# Each command imports the modules it needs when it runs, so e.g. extracting never loads the compiler and Lark
+from profiler import Profiler, enable, phase
 from utils import error, log
 
-from PyFF7.lgp import LGP, pack_lgp
-from constants import *
+from constants import COMPILE_CACHE_DIR, COMPILE_CACHE_SIZE, OUTPUT_DIR
 
 VERSION = "0.9.2"
 
 USAGE = "USAGE:\n\
-* Extract scripts: %s extract <world lgp file>\n\
-* Compile scripts: %s compile <input directory> <output lgp file>" % (argv[0], argv[0])
+* Extract scripts: %s extract <world lgp file> [-v] [--jobs N] [--profile FILE [--cprofile PHASE]]\n\
+* Compile scripts: %s compile <input directory> <output lgp file> [--jobs N] [--no-cache] [--clear-cache] [--repack] [--map FILE] [--optimize]\n\
+                   [--profile FILE [--cprofile PHASE]]\n\
+* Analyze scripts: %s analyze <world lgp file> [--sort COLUMN] [--json]\n\
+* Verify round-trip: %s verify <world lgp file> [--jobs N]\n\
+* Watch and update: %s watch <input directory> <output lgp file> [--jobs N] [--no-cache] [--optimize]" % \
+        (argv[0], argv[0], argv[0], argv[0], argv[0])
 
 
 def header():
@@ -30,7 +35,32 @@ def header():
     print("---------------------------------------------\n")
 
 
-def compile_world(input_directory, output_file):
+def get_option(name, default=None):
+    if name in argv[:-1]:
+        return argv[argv.index(name) + 1]
+    return default
+
+
+def open_cache(clear=False):
+    """Returns the compile cache, or None when its directory can't be written"""
+    from cache import CompileCache
+
+    try:
+        cache = CompileCache(COMPILE_CACHE_DIR, COMPILE_CACHE_SIZE)
+    except OSError as e:
+        log("Compile cache disabled: %s" % e)
+        return None
+
+    if clear:
+        log("Clearing compile cache...")
+        cache.clear()
+    return cache
+
+
+def compile_world(input_directory, output_file, jobs=1, cache=None, repack=False, map_file=None, optimize=False):
+    from parse import Parser
+    from PyFF7.lgp import LGP, repack_lgp
+
     if not isdir(input_directory):
         error("Input directory not found!")
         exit(1)
@@ -39,58 +69,218 @@ def compile_world(input_directory, output_file):
         error("Output LGP file not found!")
         exit(1)
 
-    if not isdir(TEMP_DIR):
-        makedirs(TEMP_DIR)
-
     log("Compiling world scripts...")
-    parser = Parser(input_directory)
+    parser = Parser(input_directory, jobs, cache, optimize)
     parser.compile()
+    scripts = parser.build_files()
 
-    log("Extracting LGP archive...")
-    lgp = LGP(output_file)
-    files = []
-    for i, e in enumerate(lgp.load_files()):
-        filename = "%s/%s" % (TEMP_DIR, e[0])
-        f = open(filename, 'wb');
-        f.write(e[1])
-        f.close()
-        files.append((e[0], filename))
+    if map_file is not None:
+        log("Writing map file: " + map_file)
+        parser.write_map(map_file)
 
-    log("Writing new scripts...")
-    parser.write_files(TEMP_DIR)
+    if not repack:
+        log("Updating LGP archive...")
+        with phase('write lgp', sum(len(data) for name, data in scripts)):
+            lgp = LGP(output_file, writable=True)
+            for name, data in scripts:
+                lgp.update_entry(name, data)
+            lgp.close()
+        return
 
     log("Packing a new LGP archive...")
-    pack_lgp(files, output_file)
+    with phase('pack lgp') as current:
+        lgp = LGP(output_file)
+        repack_lgp(lgp, dict(scripts), output_file + '.tmp')
+        lgp.close()
+        replace(output_file + '.tmp', output_file)
+        current.bytes = getsize(output_file)
+
+
+def watch_world(input_directory, output_file, jobs=1, cache=None, optimize=False):
+    """Updates the archive every time a file in the input directory changes. The parser, compiled functions and the
+    archive stay loaded between updates, so only changed functions and messages are compiled again and only
+    changed files are written to the archive."""
+    from parse import Parser
+    from PyFF7.lgp import LGP
+    from watcher import create_watcher
+
+    if not isdir(input_directory):
+        error("Input directory not found!")
+        exit(1)
+
+    if not isfile(output_file):
+        error("Output LGP file not found!")
+        exit(1)
+
+    parser = Parser(input_directory, jobs, cache, optimize)
+    lgp = LGP(output_file, writable=True)
+    written = {name: bytes(lgp.open_entry(name)) for name in ['mes', 'wm0.ev', 'wm2.ev', 'wm3.ev']
+               if lgp.get(name) is not None}
+
+    directories = [input_directory] + [input_directory + '/' + name for name in ['wm0.ev', 'wm2.ev', 'wm3.ev']
+                                       if isdir(input_directory + '/' + name)]
+    watcher = create_watcher(directories)
+    log("Watching %s for changes (%s), press Ctrl+C to stop" % (input_directory, type(watcher).__name__))
+
+    try:
+        while True:
+            start = perf_counter()
+            try:
+                parser.compile()
+                files = parser.build_files()
+            except SystemExit:
+                error("Archive not updated, waiting for the next change...")
+            else:
+                changed = [(name, data) for name, data in files if written.get(name) != data]
+                for name, data in changed:
+                    lgp.update_entry(name, data)
+                    written[name] = data
+
+                if changed:
+                    log("Updated %s in %.0f ms" % (', '.join(name for name, data in changed),
+                                                   (perf_counter() - start) * 1000))
+                else:
+                    log("Nothing to update")
+
+            watcher.wait()
+    except KeyboardInterrupt:
+        log("Stopped watching")
+    finally:
+        watcher.close()
+        lgp.close()
 
 
-def extract_world(lgp_file, verbose):
+def extract_world(lgp_file, verbose, jobs=1):
+    from extrator import Extractor
+
     if not isfile(lgp_file):
         error("Input LGP file not found!")
         exit(1)
 
-    extractor = Extractor(lgp_file, OUTPUT_DIR, verbose)
+    extractor = Extractor(lgp_file, OUTPUT_DIR, verbose, jobs)
     extractor.extract()
 
 
+def analyze_world(lgp_file, sort='worst', as_json=False):
+    from analysis import analyze_script, format_json, format_table, COLUMNS
+    from PyFF7.lgp import LGP
+
+    if not isfile(lgp_file):
+        error("Input LGP file not found!")
+        exit(1)
+
+    if sort not in COLUMNS + ['function']:
+        error("Unknown sort column: %s (choose from %s)" % (sort, ', '.join(COLUMNS + ['function'])))
+        exit(1)
+
+    lgp = LGP(lgp_file, use_mmap=True)
+    results = []
+    for name in ['wm0.ev', 'wm2.ev', 'wm3.ev']:
+        if lgp.get(name) is None:
+            error("Script file '%s' not found inside %s!" % (name, lgp_file))
+            exit(1)
+        results += analyze_script(name, lgp.open_entry(name))
+    lgp.close()
+
+    results.sort(key=lambda r: r[sort], reverse=sort != 'function')
+    print(format_json(results) if as_json else format_table(results))
+
+
+def verify_world(lgp_file, jobs=1):
+    from extrator import Extractor
+    from verifier import verify_scripts
+    from PyFF7.lgp import LGP
+
+    if not isfile(lgp_file):
+        error("Input LGP file not found!")
+        exit(1)
+
+    lgp = LGP(lgp_file, use_mmap=True)
+    for name in ['mes', 'wm0.ev', 'wm2.ev', 'wm3.ev']:
+        if lgp.get(name) is None:
+            error("File '%s' not found inside %s!" % (name, lgp_file))
+            exit(1)
+
+    extractor = Extractor(None, None, False)
+    extractor.read_messages(lgp.open_entry('mes'))
+    scripts = [(name, bytes(lgp.open_entry(name))) for name in ['wm0.ev', 'wm2.ev', 'wm3.ev']]
+    lgp.close()
+
+    log("Verifying world scripts...")
+    checked, mismatches = verify_scripts(scripts, extractor.messages, jobs)
+    for filename, function, offset, reason in mismatches:
+        error("%s %s (offset 0x%04x): %s" % (filename, function, offset * 2 + 0x400, reason))
+
+    log("%d functions checked, %d don't round-trip" % (checked, len(mismatches)))
+    if mismatches:
+        exit(1)
+
+
 if __name__ == "__main__":
-    header()
+    if '--json' not in argv:  # keep stdout valid JSON
+        header()
 
     if len(argv) < 2:
         print(USAGE); exit(1)
 
+    profiler = None
+    if get_option('--profile'):
+        profiler = Profiler(get_option('--cprofile'))
+        enable(profiler)
+
     if argv[1] == 'extract':
         if len(argv) < 3:
             print(USAGE); exit(1)
 
         verbose = False
-        if len(argv) > 3 and argv[3][:2] == '-v':
+        if any(arg[:2] == '-v' for arg in argv[3:]):
             verbose = True
 
-        extract_world(argv[2], verbose)
+        extract_world(argv[2], verbose, int(get_option('--jobs', 1)))
 
     elif argv[1] == 'compile':
         if len(argv) < 4:
             print(USAGE); exit(1)
-        compile_world(argv[2], argv[3])
+        jobs = get_option('--jobs')
+
+        cache = None
+        if '--no-cache' not in argv:
+            cache = open_cache('--clear-cache' in argv)
+
+        compile_world(argv[2], argv[3], int(jobs) if jobs else cpu_count(), cache, '--repack' in argv,
+                      get_option('--map'), '--optimize' in argv)
+
+    elif argv[1] == 'analyze':
+        if len(argv) < 3:
+            print(USAGE); exit(1)
+
+        analyze_world(argv[2], get_option('--sort', 'worst'), '--json' in argv)
+
+    elif argv[1] == 'watch':
+        if len(argv) < 4:
+            print(USAGE); exit(1)
+        jobs = get_option('--jobs')
+
+        cache = None
+        if '--no-cache' not in argv:
+            cache = open_cache()
+
+        watch_world(argv[2], argv[3], int(jobs) if jobs else cpu_count(), cache, '--optimize' in argv)
+
+    elif argv[1] == 'verify':
+        if len(argv) < 3:
+            print(USAGE); exit(1)
+        jobs = get_option('--jobs')
 
+        verify_world(argv[2], int(jobs) if jobs else cpu_count())
 
+    if profiler is not None:
+        profile_file = get_option('--profile')
+        log("Writing profile to " + profile_file)
+        profiler.write(profile_file)
+        if profiler.capture is not None:
+            stats_file = splitext(profile_file)[0] + '.prof'
+            if profiler.write_stats(stats_file):
+                log("Writing cProfile statistics of phase '%s' to %s" % (profiler.capture, stats_file))
+            else:
+                error("Phase '%s' didn't run, no cProfile statistics written" % profiler.capture)
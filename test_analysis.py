@@ -0,0 +1,62 @@
+from unittest import TestCase
+from array import array
+from json import loads
+from os.path import abspath, dirname
+from subprocess import run
+from sys import executable
+from tempfile import TemporaryDirectory
+
+from analysis import analyze_function, analyze_script
+from benchmarks.corpus import make_world
+from compiler import CompilerSession
+from constants import FUNCTION_SYSTEM
+from extrator import Extractor
+
+
+class AnalysisTest(TestCase):
+    session = CompilerSession()
+
+    @staticmethod
+    def analyze(source):
+        code = array('H', [0x203])
+        code.frombytes(bytes(AnalysisTest.session.compile_string(source, 1)))
+        name, opcodes, labels, entry, blocks = Extractor(None, None, False).read_functions([(FUNCTION_SYSTEM, 1, 0)], code)[0]
+        return analyze_function(opcodes, blocks, code)
+
+    def test_straight_line(self):
+        result = AnalysisTest.analyze('LoadModel(0)\nWait(10)\nEnd')
+
+        assert result == {'instructions': 7, 'best': 7, 'worst': 7, 'loops': 0, 'wait': 10}
+
+    def test_branches_and_loops(self):
+        result = AnalysisTest.analyze('@LABEL_1\n'
+                                      'If SavemapByte(0x0C15) < 5 Then\n'
+                                      '  PlaySound(433)\n'
+                                      '  Wait(2)\n'
+                                      'EndIf\n'
+                                      'GoTo @LABEL_1\n'
+                                      'End')
+
+        assert result == {'instructions': 13, 'best': 6, 'worst': 12, 'loops': 1, 'wait': 2}
+
+    def test_script(self):
+        script = bytearray(0x400)
+        script[4:8] = b'\x00\x00\x01\x00'
+        script[8:] = b'\xff\xff\x00\x00' * ((0x400 - 8) // 4)
+        script += b'\x03\x02' + bytes(AnalysisTest.session.compile_string('LoadModel(0)\nEnd', 1))
+
+        assert analyze_script('wm0.ev', bytes(script)) == [{'script': 'wm0.ev', 'function': '000_system_00',
+                                                             'instructions': 4, 'best': 4, 'worst': 4, 'loops': 0,
+                                                             'wait': 0}]
+
+
+class AnalyzeCommandTest(TestCase):
+    def test_json_output(self):
+        with TemporaryDirectory() as tmp:
+            make_world(tmp + '/src', tmp + '/world.lgp', functions=10)
+            result = run([executable, 'terraform.py', 'analyze', tmp + '/world.lgp', '--json'],
+                         cwd=dirname(abspath(__file__)), capture_output=True, text=True, check=True)
+
+        results = loads(result.stdout)
+        assert len(results) == 30
+        assert all(r['worst'] >= r['best'] for r in results)
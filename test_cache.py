@@ -0,0 +1,67 @@
+from unittest import TestCase
+from unittest.mock import patch
+from os import utime
+from os.path import isfile
+from tempfile import TemporaryDirectory
+
+from cache import CompileCache
+from compiler import CompilerSession
+
+
+class CompileCacheTest(TestCase):
+    session = CompilerSession()
+
+    def test_roundtrip(self):
+        source = 'LoadModel(0)\n@LABEL_1\nLoadModel(1)\nGoTo @LABEL_1'
+        with TemporaryDirectory() as tmp:
+            cache = CompileCache(tmp, 1024)
+            key = cache.key(source)
+            assert cache.get(key) is None
+
+            cache.put(key, CompileCacheTest.session.compile_string_object(source))
+            obj = cache.get(key)
+            assert obj.fixups == [9]
+            assert bytes(obj.link(3)) == bytes(CompileCacheTest.session.compile_string(source, 3))
+            assert cache.key(source + '\n') != key
+
+    def test_corrupt_entry(self):
+        obj = CompileCacheTest.session.compile_string_object('LoadModel(0)\n@LABEL_1\nGoTo @LABEL_1')
+        with TemporaryDirectory() as tmp:
+            cache = CompileCache(tmp, 1024)
+            for size in [0, 1, 3, 8]:
+                cache.put('a', obj)
+                with open(cache.path('a'), 'r+b') as f:
+                    f.truncate(size)
+
+                assert cache.get('a') is None
+                assert not isfile(cache.path('a'))
+            assert cache.hits == 0 and cache.misses == 4
+
+    def test_entry_removed_concurrently(self):
+        obj = CompileCacheTest.session.compile_string_object('End')
+        with TemporaryDirectory() as tmp:
+            cache = CompileCache(tmp, 0)
+            cache.put('a', obj)
+            cache.put('b', obj)
+            with patch('cache.listdir', return_value=['a.obj', 'b.obj', 'gone.obj']):
+                assert [e[2] for e in cache.entries()] == ['a.obj', 'b.obj']
+
+            with patch('cache.remove', side_effect=FileNotFoundError):
+                cache.evict()
+
+    def test_evict_least_recently_used(self):
+        obj = CompileCacheTest.session.compile_string_object('End')
+        with TemporaryDirectory() as tmp:
+            cache = CompileCache(tmp, 8)
+            for i, key in enumerate(['a', 'b', 'c']):
+                cache.put(key, obj)
+                utime(cache.path(key), (i, i))
+
+            cache.get('a')
+            cache.evict()
+            assert cache.get('a') is not None
+            assert cache.get('b') is None
+            assert cache.get('c') is not None
+
+            cache.clear()
+            assert cache.get('c') is None
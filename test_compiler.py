@@ -1,16 +1,22 @@
 from unittest import TestCase
+from unittest.mock import patch
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
 from io import StringIO
+from os import chdir, getcwd, listdir
+from tempfile import TemporaryDirectory
 
-from compiler import Compiler
+import compiler as compiler_module
+from compiler import CompilerSession, load_parser
 from lark import Lark
 
 
 class CompilerTest(TestCase):
+    session = CompilerSession()
+
     @staticmethod
     def assert_compiled(input, output, offset: int = 0):
-        file_mock = StringIO(input)
-        compiler = Compiler(file_mock, offset)
-        compiled = bytes(compiler.compile()).hex()
+        compiled = bytes(CompilerTest.session.compile_string(input, offset)).hex()
         expected = output.replace(' ', '')
         assert compiled == expected, 'Actual output doesn\'t match expected output:\n'
 
@@ -170,3 +176,111 @@ class ParserTest(TestCase):
             GoTo @LABEL_1
             @LABEL_1
         """)
+
+
+def compile_fresh(value):
+    """Process pool worker: loads the parser from the cache directory like a newly started process"""
+    compiler_module._parser = None
+    output = StringIO()
+    try:
+        with redirect_stdout(output):
+            return bytes(CompilerSession().compile_string('LoadModel(%d)' % value)).hex()
+    except SystemExit:
+        return output.getvalue()
+
+
+class GrammarCacheTest(TestCase):
+    def test_cache_outside_cwd(self):
+        cwd = getcwd()
+        parser = compiler_module._parser
+        try:
+            with TemporaryDirectory() as tmp, TemporaryDirectory() as cache_dir, \
+                    patch.object(compiler_module, 'CACHE_DIR', cache_dir):
+                chdir(tmp)
+                compiler_module._parser = None
+                loaded = load_parser()
+                assert loaded.parse('End').children[0] == 'End'
+                assert load_parser() is loaded
+                assert any(f.startswith('world_script_') for f in listdir(cache_dir))
+                assert listdir(tmp) == []
+        finally:
+            chdir(cwd)
+            compiler_module._parser = parser
+
+    def test_parallel_first_load(self):
+        with TemporaryDirectory() as tmp, patch.object(compiler_module, 'CACHE_DIR', tmp):
+            with ProcessPoolExecutor(max_workers=8) as pool:
+                results = list(pool.map(compile_fresh, range(32)))
+
+            assert results == ['00011001%02x000003' % value for value in range(32)]
+            assert not any(f.endswith('.tmp') for f in listdir(tmp))
+
+    def test_unwritable_cache(self):
+        with TemporaryDirectory() as tmp, patch.object(compiler_module, 'CACHE_DIR', tmp + '/file/cache'):
+            open(tmp + '/file', 'w').close()
+
+            assert compiler_module.grammar_cache()[1] is None
+            assert compiler_module.build_parser().parse('End').children[0] == 'End'
+
+    def test_corrupt_cache(self):
+        parser = compiler_module._parser
+        try:
+            with TemporaryDirectory() as tmp, patch.object(compiler_module, 'CACHE_DIR', tmp):
+                cache_file = compiler_module.grammar_cache()[1]
+                with open(cache_file, 'wb') as f:
+                    f.write(b'\x80\x04')
+
+                compiler_module._parser = None
+                assert load_parser().parse('End').children[0] == 'End'
+                assert len(listdir(tmp)) == 1
+        finally:
+            compiler_module._parser = parser
+
+
+class CompilerSessionTest(TestCase):
+    def test_shared_tables(self):
+        session = CompilerSession()
+        first = session.compile_string('LoadModel(0)')
+        second = session.compile_string('LoadModel(1)')
+
+        assert bytes(first).hex() == '0001100100000003'
+        assert bytes(second).hex() == '0001100101000003'
+        assert session.parser is load_parser()
+
+    def test_session_tables(self):
+        session = CompilerSession()
+        session.constants = dict(session.constants, Origin='7')
+
+        assert bytes(session.compile_string('LoadModel($Origin)')).hex() == '0001100107000003'
+        assert CompilerSession().compile_parser is not session.compile_parser
+
+
+class FunctionObjectTest(TestCase):
+    def test_link(self):
+        session = CompilerSession()
+        source = 'LoadModel(0)\n@LABEL_1\nLoadModel(1)\nGoTo @LABEL_1'
+        obj = session.compile_string_object(source)
+
+        assert obj.fixups == [9]
+        assert len(obj) == 10
+        assert bytes(obj.link(0x10)).hex() == bytes(session.compile_string(source, 0x10)).hex()
+        assert bytes(obj.link(0x10)).hex() == '00011001000000030001100101000003' + '00021400'
+
+
+class CompileErrorTest(TestCase):
+    def compile_error(self, source):
+        output = StringIO()
+        with redirect_stdout(output), self.assertRaises(SystemExit):
+            CompilerSession().compile_string(source)
+        return output.getvalue()
+
+    def test_unknown_opcode(self):
+        output = self.compile_error('LoadModel(0) # model\n# comment\n\n  Bar()')
+        assert 'Unknown opcode: Bar while parsing <string> on line 4' in output
+
+    def test_endif(self):
+        assert 'EndIf without a matching If' in self.compile_error('LoadModel(0)\nEndIf')
+
+    def test_unknown_value(self):
+        assert 'Unknown value: Nowhere while parsing <string> on line 2' in \
+               self.compile_error('LoadModel(0)\nLoadModel($Nowhere)')
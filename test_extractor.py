@@ -0,0 +1,40 @@
+from unittest import TestCase
+from array import array
+
+from compiler import CompilerSession
+from constants import FUNCTION_SYSTEM
+from extrator import Extractor
+
+
+class ExtractorTest(TestCase):
+    session = CompilerSession()
+
+    @staticmethod
+    def decode(source):
+        code = array('H', [0x203])
+        code.frombytes(bytes(ExtractorTest.session.compile_string(source, 1)))
+        extractor = Extractor(None, None, False)
+        return extractor.read_functions([(FUNCTION_SYSTEM, 1, 0)], code)[0]
+
+    def test_spans(self):
+        name, opcodes, labels, entry, blocks = ExtractorTest.decode('WriteTo(TempByte(0), SpecialByte(2) * 9 >> 8)\nEnd')
+
+        assert [(op.name, op.start, op.end) for op in opcodes] == \
+               [('ResetStack', 1, 2), ('WriteTo', 2, 13), ('Return', 13, 14)]
+        assert opcodes[1].params == ['TempByte(0)', 'SpecialByte($EntityCoordInMeshX) * 9 >> 8']
+
+    def test_cfg(self):
+        name, opcodes, labels, entry, blocks = ExtractorTest.decode(
+            '@LABEL_1\nIf SavemapByte(0x0C15) < 5 Then\n  PlaySound(433)\nEndIf\nGoTo @LABEL_1\nEnd')
+
+        assert [op.name for op in opcodes] == ['ResetStack', 'If', 'ResetStack', 'PlaySound', 'EndIf', 'GoTo', 'Return']
+        assert [(b.first, b.last, b.successors) for b in blocks] == [(0, 2, [1, 2]), (2, 5, [2]), (5, 6, [0]), (6, 7, [])]
+        assert labels == {1: 1}
+
+    def test_range(self):
+        code = array('H', [0x203])
+        code.frombytes(bytes(ExtractorTest.session.compile_string('LoadModel(0)\nEnd', 1)))
+        index = [(FUNCTION_SYSTEM, 1, 0), (FUNCTION_SYSTEM, 1, 1), (FUNCTION_SYSTEM, 1, 2)]
+        functions = Extractor(None, None, False).read_functions(index, code, 1, 2)
+
+        assert functions == [('001-000_system_01', None)]
@@ -0,0 +1,113 @@
+from unittest import TestCase
+from unittest.mock import patch
+from io import BytesIO
+from os.path import getsize
+from tempfile import TemporaryDirectory
+
+import PyFF7.lgp as lgp_module
+from PyFF7.lgp import LGP, copy_range, pack_lgp, repack_lgp
+
+
+class LGPTest(TestCase):
+    FILES = [('abc.tex', b'\x01\x02\x03'), ('mes', b'message data'), ('wm0.ev', bytes(range(256)) * 4)]
+
+    @staticmethod
+    def make_archive(directory):
+        files = []
+        for name, data in LGPTest.FILES:
+            with open(directory + '/' + name, 'wb') as f:
+                f.write(data)
+            files.append((name, directory + '/' + name))
+
+        pack_lgp(files, directory + '/test.lgp')
+        return directory + '/test.lgp'
+
+    def test_load_files(self):
+        with TemporaryDirectory() as tmp:
+            lgp = LGP(LGPTest.make_archive(tmp), check=True)
+            assert [(name, bytes(data)) for name, data in lgp.load_files()] == LGPTest.FILES
+            lgp.close()
+
+    def test_mmap(self):
+        with TemporaryDirectory() as tmp:
+            lgp = LGP(LGPTest.make_archive(tmp), use_mmap=True)
+            files = list(lgp.load_files())
+            assert all(isinstance(data, memoryview) for name, data in files)
+            assert [(name, bytes(data)) for name, data in files] == LGPTest.FILES
+            del files
+            lgp.close()
+
+    def test_toc(self):
+        with TemporaryDirectory() as tmp:
+            with open(tmp + '/x.bin', 'wb') as f:
+                f.write(b'x')
+
+            pack_lgp([('a/xx.bin', tmp + '/x.bin'), ('b/xx.bin', tmp + '/x.bin'), ('yy.bin', tmp + '/x.bin')], tmp + '/test.lgp')
+            lgp = LGP(tmp + '/test.lgp', check=True)
+            assert [entry['filename'] for entry in lgp.toc] == ['a/xx.bin', 'b/xx.bin', 'yy.bin']
+            assert [entry['filesize'] for entry in lgp] == [1, 1, 1]
+            assert lgp.conflicting_filenames == {'xx.bin'}
+            lgp.close()
+
+    def test_get(self):
+        with TemporaryDirectory() as tmp:
+            lgp = LGP(LGPTest.make_archive(tmp))
+            assert lgp.get('wm0.ev')['data_start'] == lgp.toc[2]['data_start']
+            assert lgp.get('wm1.ev') is None
+            assert lgp.get('x') is None
+            assert bytes(lgp.open_entry('mes')) == b'message data'
+            assert not lgp.filesizes_loaded
+            self.assertRaises(KeyError, lgp.open_entry, 'missing')
+            lgp.close()
+
+    def test_update_entry(self):
+        with TemporaryDirectory() as tmp:
+            filename = LGPTest.make_archive(tmp)
+            lgp = LGP(filename, writable=True)
+            size = getsize(filename)
+            lgp.update_entry('abc.tex', b'\x04\x05')  # fits its slot
+            assert getsize(filename) == size
+            lgp.update_entry('mes', b'a much longer message than before')  # moved to the end
+            lgp.update_entry('wm0.ev', b'ev')  # last entry, archive shrinks
+            lgp.close()
+
+            lgp = LGP(filename, check=True)
+            assert [(name, data) for name, data in lgp.load_files()] == \
+                   [('abc.tex', b'\x04\x05'), ('mes', b'a much longer message than before'), ('wm0.ev', b'ev')]
+            assert lgp.terminator == 'FINAL FANTASY7'
+            lgp.close()
+
+    def test_pack_buffers(self):
+        with TemporaryDirectory() as tmp:
+            with open(tmp + '/a.bin', 'wb') as f:
+                f.write(b'from disk')
+
+            pack_lgp([('a.bin', tmp + '/a.bin'), ('b.bin', b'from bytes'), ('c.bin', BytesIO(b'from stream'))], tmp + '/test.lgp')
+            lgp = LGP(tmp + '/test.lgp', check=True)
+            assert list(lgp.load_files()) == [('a.bin', b'from disk'), ('b.bin', b'from bytes'), ('c.bin', b'from stream')]
+            lgp.close()
+
+    def test_repack(self):
+        with TemporaryDirectory() as tmp:
+            lgp = LGP(LGPTest.make_archive(tmp))
+            repack_lgp(lgp, {'mes': b'new message'}, tmp + '/repacked.lgp')
+            lgp.close()
+
+            lgp = LGP(tmp + '/repacked.lgp', check=True)
+            assert list(lgp.load_files()) == [LGPTest.FILES[0], ('mes', b'new message'), LGPTest.FILES[2]]
+            lgp.close()
+
+    def test_copy_range_fallback(self):
+        with TemporaryDirectory() as tmp:
+            with open(tmp + '/in.bin', 'wb') as f:
+                f.write(bytes(range(256)) * 16)
+
+            with open(tmp + '/in.bin', 'rb') as infile, open(tmp + '/out.bin', 'wb') as outfile:
+                outfile.write(b'header')
+                copy_range(infile, 100, 3000, outfile)
+                with patch.object(lgp_module.os, 'copy_file_range', side_effect=OSError, create=True):
+                    copy_range(infile, 5, 10, outfile)
+                outfile.write(b'end')
+
+            with open(tmp + '/out.bin', 'rb') as f:
+                assert f.read() == b'header' + (bytes(range(256)) * 16)[100:3100] + bytes(range(5, 15)) + b'end'
@@ -0,0 +1,50 @@
+from unittest import TestCase
+
+from compiler import CompilerSession
+from optimizer import optimize
+
+
+class OptimizerTest(TestCase):
+    session = CompilerSession()
+
+    @staticmethod
+    def assert_optimized(input, output, fixups=None):
+        obj = optimize(OptimizerTest.session.compile_string_object(input))
+        assert obj.code.hex() == output.replace(' ', ''), 'Actual output doesn\'t match expected output:\n'
+        if fixups is not None:
+            assert obj.fixups == fixups
+
+    def test_constant_folding(self):
+        OptimizerTest.assert_optimized('WriteTo(TempByte(0), 2 + 3 * 4)', '0001 1901 0000 1001 0e00 e000')
+        OptimizerTest.assert_optimized('SetEntitySpeed(SpecialByte(4) + 1 + 2)', '0001 1b01 0400 1001 0100 4000 '
+                                       '1001 0200 4000 0303')
+
+    def test_negative_not_folded(self):
+        OptimizerTest.assert_optimized('SetEntityAltitudeOffset(-400)', '0001 1001 9001 1500 0b03')
+        OptimizerTest.assert_optimized('SetEntitySpeed(1 - 2)', '0001 1001 0100 1001 0200 4100 0303')
+
+    def test_large_shift_not_folded(self):
+        OptimizerTest.assert_optimized('SetEntitySpeed(100 >> 2)', '0001 1001 1900 0303')
+        OptimizerTest.assert_optimized('SetEntitySpeed(100 >> 40)', '0001 1001 6400 1001 2800 5100 0303')
+        OptimizerTest.assert_optimized('SetEntitySpeed(100 << 40)', '0001 1001 6400 1001 2800 5000 0303')
+
+    def test_redundant_resets(self):
+        OptimizerTest.assert_optimized('LoadModel(0)\nLoadModel(1)\nEnd', '0001 1001 0000 0003 1001 0100 0003 0302')
+
+    def test_jumps(self):
+        OptimizerTest.assert_optimized('If SavemapByte(0x0C15) < 5 Then\n'
+                                       '  PlaySound(433)\n'
+                                       'EndIf\n'
+                                       'PlaySound(434)\n'
+                                       'End',
+                                       '0001 1801 7100 1001 0500 6000 0102 0b00 1001 b101 1d03 0001 1001 b201 '
+                                       '1d03 0302', [7])
+        OptimizerTest.assert_optimized('@LABEL_1\nLoadModel(0)\nLoadModel(2)\nGoTo @LABEL_1',
+                                       '0001 1001 0000 0003 1001 0200 0003 0002 0000', [8])
+
+    def test_goto_next(self):
+        OptimizerTest.assert_optimized('GoTo @LABEL_1\n@LABEL_1\nLoadModel(1)\nEnd', '0001 1001 0100 0003 0302', [])
+
+    def test_link(self):
+        obj = optimize(OptimizerTest.session.compile_string_object('@LABEL_1\nLoadModel(0)\nGoTo @LABEL_1'))
+        assert bytes(obj.link(0x10)).hex() == '000110010000000300021000'
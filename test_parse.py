@@ -0,0 +1,106 @@
+from unittest import TestCase
+from unittest.mock import patch
+from io import StringIO
+from tempfile import TemporaryDirectory
+
+import compiler
+import parse
+from benchmarks.corpus import make_corpus
+from cache import CompileCache
+from compiler import FunctionObject
+from parse import Parser, layout_messages, function_ident, MES_SIZE, EV_SIZE
+
+
+class MessagesTest(TestCase):
+    def test_read_messages(self):
+        messages = Parser.read_messages(StringIO('---[ MES 0\nHello\n---[ MES 1\nTwo\nlines\n---[ MES 2\n'))
+
+        assert messages == [(2, 'Hello\n'), (4, 'Two\nlines\n'), (7, '')]
+
+    def test_message_cache(self):
+        with TemporaryDirectory() as tmp:
+            with open(tmp + '/messages.txt', 'w') as f:
+                f.write('---[ MES 0\nHello\n---[ MES 1\nWorld\n---[ MES 2\nHello\n')
+
+            parser = Parser(tmp, cache=CompileCache(tmp + '/cache', 1024))
+            with patch.object(parse, 'encode_text', wraps=parse.encode_text) as encode:
+                parser.load_messages()
+                assert encode.call_count == 2
+
+                mes = parser.build_messages()
+                parser.load_messages()
+                assert encode.call_count == 2
+                assert parser.build_messages() is mes
+
+                # A fresh parser takes the whole mes file from the disk cache
+                other = Parser(tmp, cache=CompileCache(tmp + '/cache', 1024))
+                other.load_messages()
+                assert other.build_messages() == mes
+                assert encode.call_count == 2
+
+                with open(tmp + '/messages.txt', 'a') as f:
+                    f.write('---[ MES 3\nAgain\n')
+                parser.load_messages()
+                assert encode.call_count == 3
+                assert len(parser.messages) == 4
+
+
+class LayoutTest(TestCase):
+    def test_shared_tails(self):
+        messages = [b'\x21\x22\xff', b'\x22\xff', b'\x30\xff', b'\x21\x22\xff', b'\x10\x21\x22\xff']
+        offsets, data = layout_messages(messages)
+
+        assert data == b'\x30\xff\x10\x21\x22\xff'
+        assert offsets == [3, 4, 0, 3, 2]
+        for message, offset in zip(messages, offsets):
+            assert data[offset:offset + len(message)] == message
+
+    def test_overflow(self):
+        parser = Parser('.')
+        parser.messages = [bytes([i % 0xF0, i // 0xF0]) * 50 + b'\xff' for i in range(MES_SIZE // 100)]
+
+        with self.assertRaises(SystemExit):
+            parser.build_messages()
+
+
+class ScriptLayoutTest(TestCase):
+    def test_function_ident(self):
+        assert function_ident('003_system_12.s') == (12, None)
+        assert function_ident('004-002_model_3_20.s') == (0x4314, '002')
+        assert function_ident('010_mesh_2_5_1.s') == ((2 * 36 + 5) << 4 | 1 | 0x8000, None)
+
+    def test_plan(self):
+        parser = Parser('.')
+        parser.scripts = [('wm0.ev', [('000_system_00.s', FunctionObject(b'\x03\x02', [])),
+                                      ('001_system_01.s', FunctionObject(b'\x00\x02\x00\x00', [1])),
+                                      ('002-001_system_02.s', None)])]
+        script, entries, size = parser.plan_scripts()[0]
+
+        assert size == 4
+        assert entries == [('000_system_00.s', 0, 1, 1, None), ('001_system_01.s', 1, 2, 2, None),
+                           ('002-001_system_02.s', 2, 2, 0, '001')]
+
+        data = parser.build_scripts()[0][1]
+        assert data[12:16] == b'\x02\x00\x02\x00'
+        assert data[0x404:0x408] == b'\x00\x02\x02\x00'
+
+    def test_code_overflow(self):
+        parser = Parser('.')
+        parser.scripts = [('wm0.ev', [('000_system_00.s', FunctionObject(bytes(EV_SIZE), []))])]
+
+        with self.assertRaises(SystemExit):
+            parser.plan_scripts()
+
+
+class ParallelCompileTest(TestCase):
+    def test_empty_grammar_cache(self):
+        with TemporaryDirectory() as tmp, patch.object(compiler, 'CACHE_DIR', tmp + '/cache'), \
+                patch.object(compiler, '_session', None), patch.object(compiler, '_parser', None):
+            make_corpus(tmp + '/src', functions=20, seed=1)
+            parser = Parser(tmp + '/src', jobs=4)
+            with patch('sys.stdout', StringIO()):
+                parser.load_scripts()
+
+            assert [len(functions) for script, functions in parser.scripts] == [20, 20, 20]
+            assert all(obj is not None for script, functions in parser.scripts for name, obj in functions
+                       if '-' not in name)
@@ -0,0 +1,57 @@
+from unittest import TestCase
+from json import load
+from os.path import join
+from tempfile import TemporaryDirectory
+
+from profiler import Profiler, enable, disable, phase, record_file
+
+
+class ProfilerTest(TestCase):
+    def tearDown(self):
+        disable()
+
+    def test_disabled(self):
+        with phase('nothing', 10) as current:
+            current.bytes += 5
+
+        assert current.bytes == 15
+        assert current.wall > 0
+
+    def test_phases(self):
+        p = Profiler()
+        enable(p)
+        with phase('first', 100):
+            pass
+        with phase('second') as current:
+            current.bytes += 42
+        record_file('wm0.ev/a.s', 0.5, 0.125, 20)
+        record_file('wm0.ev/b.s', 1.0, 0.25, 30)
+        record_file('wm2.ev/c.s', 0.25, 0.5, 8)
+        disable()
+        with phase('third'):
+            pass
+
+        report = p.report()
+        assert [(ph['name'], ph['bytes']) for ph in report['phases']] == [('first', 100), ('second', 42)]
+        assert report['files']['count'] == 3
+        assert [f['path'] for f in report['files']['slowest']] == ['wm0.ev/b.s', 'wm2.ev/c.s', 'wm0.ev/a.s']
+        assert report['scripts'] == {'wm0.ev': {'count': 2, 'parse': 1.5, 'codegen': 0.375, 'bytes': 50},
+                                     'wm2.ev': {'count': 1, 'parse': 0.25, 'codegen': 0.5, 'bytes': 8}}
+
+        with TemporaryDirectory() as tmp:
+            p.write(join(tmp, 'profile.json'))
+            with open(join(tmp, 'profile.json')) as f:
+                assert load(f)['phases'][1]['name'] == 'second'
+
+    def test_capture(self):
+        p = Profiler('work')
+        enable(p)
+        with phase('other'):
+            pass
+        with phase('work'):
+            sum(range(1000))
+
+        assert len(p.profiles) == 1
+        with TemporaryDirectory() as tmp:
+            assert p.write_stats(join(tmp, 'work.prof'))
+        assert not Profiler('missing').write_stats('unused.prof')
@@ -0,0 +1,34 @@
+from unittest import TestCase
+from os.path import abspath, dirname
+from subprocess import run
+from sys import executable
+
+
+class StartupTest(TestCase):
+    @staticmethod
+    def imported(statement):
+        """Returns the names of the modules loaded by ``statement`` in a fresh interpreter"""
+        result = run([executable, '-c', statement + "; import sys; print(' '.join(sys.modules))"],
+                     cwd=dirname(abspath(__file__)), capture_output=True, text=True, check=True)
+        return set(result.stdout.split())
+
+    def test_terraform(self):
+        modules = StartupTest.imported('import terraform')
+
+        assert 'lark' not in modules
+        assert 'extrator' not in modules
+        assert 'concurrent.futures' not in modules
+
+    def test_extract(self):
+        modules = StartupTest.imported('import extrator')
+
+        assert 'lark' not in modules
+        assert 'compiler' not in modules
+        assert 'PyFF7.database' not in modules
+
+    def test_compile(self):
+        # Functions served from the compile cache never need the parser
+        modules = StartupTest.imported('import parse, cache')
+
+        assert 'lark' not in modules
+        assert 'json' not in modules
@@ -0,0 +1,52 @@
+from unittest import TestCase
+from contextlib import redirect_stdout
+from io import StringIO
+from tempfile import TemporaryDirectory
+
+from benchmarks.corpus import make_world
+from compiler import CompilerSession
+from PyFF7.lgp import LGP
+from verifier import verify_scripts
+
+
+class VerifierTest(TestCase):
+    session = CompilerSession()
+
+    @staticmethod
+    def make_script(*sources):
+        index = bytearray(4)
+        code = bytearray(b'\x03\x02')
+        for i, source in enumerate(sources):
+            offset = len(code) // 2
+            index += bytes([i, 0]) + offset.to_bytes(2, 'little')
+            code += VerifierTest.session.compile_string(source, offset)
+        index += b'\xff\xff\x00\x00' * ((0x400 - len(index)) // 4)
+        return bytearray(index + code)
+
+    def test_roundtrip(self):
+        script = VerifierTest.make_script('LoadModel(0)\nEnd',
+                                          'If SavemapByte(0x0C15) < 5 Then\n  PlaySound(433)\nEndIf\nEnd',
+                                          '@LABEL_1\nWait(10)\nGoTo @LABEL_1\nEnd')
+
+        assert verify_scripts([('wm0.ev', bytes(script))], []) == (3, [])
+        assert verify_scripts([('wm0.ev', bytes(script))], [], 2) == (3, [])
+
+    def test_mismatch(self):
+        script = VerifierTest.make_script('LoadModel(0)\nEnd', 'LoadModel(1)\nEnd')
+        script[0x400 + 6 * 2] = 0x01  # unknown opcode 0x0101 that can't be compiled back
+
+        checked, mismatches = verify_scripts([('wm0.ev', bytes(script))], [])
+        assert checked == 2
+        assert [(m[0], m[1]) for m in mismatches] == [('wm0.ev', '001_system_01')]
+
+    def test_generated_world(self):
+        with TemporaryDirectory() as tmp:
+            make_world(tmp + '/src', tmp + '/world.lgp', functions=60, seed=1)
+            lgp = LGP(tmp + '/world.lgp')
+            scripts = [(name, bytes(lgp.open_entry(name))) for name in ['wm0.ev', 'wm2.ev', 'wm3.ev']]
+            lgp.close()
+
+        with redirect_stdout(StringIO()):
+            checked, mismatches = verify_scripts(scripts, [])
+        assert checked == 171
+        assert mismatches == []
@@ -0,0 +1,56 @@
+from unittest import TestCase
+from unittest.mock import patch
+from contextlib import redirect_stdout
+from io import StringIO
+from os import makedirs, utime
+from tempfile import TemporaryDirectory
+
+import parse
+from parse import Parser
+from watcher import PollingWatcher, create_watcher
+
+
+class WatcherTest(TestCase):
+    def test_polling(self):
+        with TemporaryDirectory() as tmp:
+            watcher = PollingWatcher([tmp], interval=0.01)
+            with open(tmp + '/a.s', 'w') as f:
+                f.write('End\n')
+
+            assert watcher.wait() == {tmp + '/a.s'}
+
+    def test_create_watcher(self):
+        with TemporaryDirectory() as tmp:
+            watcher = create_watcher([tmp])
+            with open(tmp + '/a.s', 'w') as f:
+                f.write('End\n')
+
+            assert tmp + '/a.s' in watcher.wait()
+            watcher.close()
+
+
+class IncrementalCompileTest(TestCase):
+    def test_recompile_changed(self):
+        with TemporaryDirectory() as tmp:
+            for script in ['wm0.ev', 'wm2.ev', 'wm3.ev']:
+                makedirs(tmp + '/' + script)
+            for name in ['000_system_00.s', '001_system_01.s']:
+                with open(tmp + '/wm0.ev/' + name, 'w') as f:
+                    f.write('End\n')
+
+            parser = Parser(tmp, jobs=1)
+            with redirect_stdout(StringIO()):
+                parser.load_scripts()
+                first = dict(parser.scripts[0][1])
+
+                with open(tmp + '/wm0.ev/001_system_01.s', 'w') as f:
+                    f.write('LoadModel(1)\nEnd\n')
+                utime(tmp + '/wm0.ev/001_system_01.s', ns=(1, 1))
+
+                with patch.object(parse, 'compile_function', wraps=parse.compile_function) as compile_function:
+                    parser.load_scripts()
+                    assert compile_function.call_count == 1
+
+            second = dict(parser.scripts[0][1])
+            assert second['000_system_00.s'] is first['000_system_00.s']
+            assert second['001_system_01.s'] is not first['001_system_01.s']
@@ -1,10 +1,22 @@
 #!/usr/bin/env python3
+from array import array
+from sys import byteorder
 
 
 def read_word(script, pos):
 	return script[pos * 2] + (script[pos * 2 + 1] << 8)
 
 
+def read_words(data, start=0, end=None):
+	"""Decodes the little-endian 16-bit words from word ``start`` up to word ``end`` in one step"""
+	end = len(data) // 2 if end is None else min(end, len(data) // 2)
+	words = array('H')
+	words.frombytes(memoryview(data)[start * 2:end * 2])
+	if byteorder == 'big':
+		words.byteswap()
+	return words
+
+
 def write_word(data, pos, word):
 	data[pos * 2] = word & 0xFF
 	data[pos * 2 + 1] = (word >> 8) & 0xFF
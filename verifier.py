@@ -0,0 +1,75 @@
+'''
+Round-trip verification: decompiles every function, compiles it again and compares the bytes with the original
+'''
+
+from contextlib import redirect_stdout
+from io import StringIO
+
+from compiler import default_session
+from extrator import Extractor
+from utils import read_words
+
+
+def verify_range(filename, script, index, first, last, messages):
+    """Process pool worker: round-trips functions ``first`` to ``last`` of an ev image. Returns the number of
+    functions checked and a list of (filename, function, offset, reason) tuples for those that don't match."""
+    extractor = Extractor(None, None, False)
+    extractor.messages = messages
+    code = extractor.read_code(script)
+    session = default_session()
+
+    checked = 0
+    mismatches = []
+    for function in extractor.read_functions(index, code, first, last):
+        name, opcodes = function[0], function[1]
+        if opcodes is None:  # duplicates point to a function that's checked on its own
+            continue
+
+        checked += 1
+        offset = function[3][1]
+        end = max(op.end for op in opcodes if op.end is not None)
+        expected = code[offset:end]
+        source = extractor.format_function(function, code)
+
+        output = StringIO()
+        try:
+            with redirect_stdout(output):
+                compiled = read_words(session.compile_string(source, offset, name + '.s'))
+        except SystemExit:
+            mismatches.append((filename, name, offset, output.getvalue().strip() or 'compile error'))
+            continue
+
+        if compiled == expected:
+            continue
+
+        if len(compiled) != len(expected):
+            reason = "size differs: %d words, expected %d" % (len(compiled), len(expected))
+        else:
+            pos = next(i for i in range(len(compiled)) if compiled[i] != expected[i])
+            reason = "word %d differs: %04x, expected %04x" % (pos, compiled[pos], expected[pos])
+        mismatches.append((filename, name, offset, reason))
+
+    return checked, mismatches
+
+
+def verify_scripts(scripts, messages, jobs=1):
+    """Round-trips every function of the ``scripts`` list of (filename, ev image) tuples, on a process pool when
+    ``jobs`` is not 1. Returns the number of functions checked and the list of mismatches."""
+    extractor = Extractor(None, None, False)
+    tasks = []
+    for filename, script in scripts:
+        index = extractor.read_index(script)
+        step = max(1, -(-len(index) // jobs))
+        for first in range(0, len(index), step):
+            tasks.append((filename, script, index, first, first + step, messages))
+
+    if jobs == 1:
+        results = [verify_range(*task) for task in tasks]
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            results = list(pool.map(verify_range, *zip(*tasks)))
+
+    checked = sum(result[0] for result in results)
+    mismatches = [mismatch for result in results for mismatch in result[1]]
+    return checked, mismatches
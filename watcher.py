@@ -0,0 +1,104 @@
+'''
+File change notification for watch mode: inotify on Linux, polling everywhere else
+'''
+
+from os import close, read, scandir
+from os.path import join
+from select import select
+from struct import unpack_from
+from time import sleep
+
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_CLOEXEC = 0o2000000
+EVENT_HEADER_SIZE = 16
+
+# Changes that arrive within this many seconds of each other are reported together
+SETTLE_TIME = 0.05
+
+
+class InotifyWatcher:
+    """Waits for changes in a set of directories using the Linux inotify API"""
+    MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+    def __init__(self, directories):
+        super(InotifyWatcher, self).__init__()
+        from ctypes import CDLL, get_errno
+        from ctypes.util import find_library
+
+        libc = CDLL(find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = libc.inotify_init1(IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(get_errno(), "inotify_init1 failed")
+
+        self.directories = {}
+        for directory in directories:
+            wd = libc.inotify_add_watch(self.fd, directory.encode(), self.MASK)
+            if wd < 0:
+                close(self.fd)
+                raise OSError(get_errno(), "inotify_add_watch failed for " + directory)
+            self.directories[wd] = directory
+
+    def read_events(self):
+        changed = set()
+        data = read(self.fd, 64 * 1024)
+        pos = 0
+        while pos < len(data):
+            wd, mask, cookie, length = unpack_from('iIII', data, pos)
+            name = data[pos + EVENT_HEADER_SIZE:pos + EVENT_HEADER_SIZE + length].rstrip(b'\0').decode()
+            changed.add(join(self.directories.get(wd, ''), name))
+            pos += EVENT_HEADER_SIZE + length
+        return changed
+
+    def wait(self):
+        """Blocks until something changes, returns the set of changed paths"""
+        select([self.fd], [], [])
+        changed = self.read_events()
+        while select([self.fd], [], [], SETTLE_TIME)[0]:
+            changed |= self.read_events()
+        return changed
+
+    def close(self):
+        close(self.fd)
+
+
+class PollingWatcher:
+    """Waits for changes in a set of directories by comparing file modification times and sizes"""
+    def __init__(self, directories, interval=0.25):
+        super(PollingWatcher, self).__init__()
+        self.directories = directories
+        self.interval = interval
+        self.state = self.scan()
+
+    def scan(self):
+        state = {}
+        for directory in self.directories:
+            for entry in scandir(directory):
+                if entry.is_file():
+                    st = entry.stat()
+                    state[entry.path] = (st.st_mtime_ns, st.st_size)
+        return state
+
+    def wait(self):
+        """Blocks until something changes, returns the set of changed paths"""
+        while True:
+            sleep(self.interval)
+            state = self.scan()
+            if state != self.state:
+                changed = {path for path in state.keys() | self.state.keys() if state.get(path) != self.state.get(path)}
+                self.state = state
+                return changed
+
+    def close(self):
+        pass
+
+
+def create_watcher(directories):
+    """Returns an InotifyWatcher when the platform supports it, otherwise a PollingWatcher"""
+    try:
+        return InotifyWatcher(directories)
+    except (OSError, AttributeError):
+        return PollingWatcher(directories)